@@ -0,0 +1,55 @@
+# Time importing zint in fresh interpreters.  Each statement runs in its own
+# subprocess so nothing is already cached in sys.modules; the child times
+# only the statement itself, not interpreter startup.  The script exits
+# non-zero when the median of "first binding", the cost everyone using zint
+# pays, is not below that of "all bindings", which builds every structure
+# layout and binding as importing zint.zint used to, or is over max_ms
+# when given.  "import zint" on its own does no work at all; the star
+# import builds everything.
+#
+#   python benchmarks/bench_import.py [runs] [max_ms]
+
+import subprocess
+import sys
+
+statements = [
+	('import zint', 'import zint'),
+	('first binding', 'import zint; zint.ZBarcode_Create'),
+	('all bindings', 'import zint.zint as z; [getattr(z, n) for n in z.__all__]'),
+	('star import', 'from zint import *'),
+	('all modules', 'import zint; zint.AsyncEncoder; zint.RenderCache; zint.pngbytes')
+]
+
+child = '''
+import time
+start = time.perf_counter()
+%s
+print(time.perf_counter() - start)
+'''
+
+def measure (statement, runs):
+	times = []
+	for _ in range(runs):
+		out = subprocess.check_output([sys.executable, '-c', child % statement])
+		times.append(float(out) * 1000)
+	times.sort()
+	return times[len(times) // 2], times[0]
+
+def main (argv):
+	runs = int(argv[1]) if len(argv) > 1 else 20
+	max_ms = float(argv[2]) if len(argv) > 2 else None
+	medians = {}
+	for name, statement in statements:
+		median, best = measure(statement, runs)
+		medians[name] = median
+		print('%-14s median %7.2fms  min %7.2fms' % (name, median, best))
+	limit = medians['all bindings']
+	if max_ms is not None:
+		limit = min(limit, max_ms)
+	if medians['first binding'] >= limit:
+		print('first binding took %.2fms, limit is %.2fms' % (medians['first binding'], limit))
+		return 1
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
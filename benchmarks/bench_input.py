@@ -0,0 +1,102 @@
+# Cost of getting a payload into ZBarcode_Encode(): the README's instr()
+# against passing bytes, bytearray or an mmap straight to the binding.
+# "adapt" times only the argument conversion, "encode" a full
+# ZBarcode_Encode() and "peak" is the most Python memory the conversion
+# allocates for one call, as seen by tracemalloc.  First every kind of
+# source, pointers included, is checked to encode exactly what bytes do.
+#
+#   python benchmarks/bench_input.py [count] [size]
+
+from ctypes import POINTER, c_char_p, c_ubyte, cast
+import mmap
+import sys
+import time
+import tracemalloc
+
+import zint
+from zint.zint import _source
+
+def convert_instr (payload):
+	return _source.from_param(zint.instr(payload))
+
+def convert_direct (payload):
+	return _source.from_param(payload)
+
+def encoded (symbol, source, length):
+	zint.ZBarcode_Clear(symbol)
+	ret = zint.ZBarcode_Encode(symbol, source, length)
+	if ret >= zint.ZINT_ERROR_TOO_LONG:
+		return ret, symbol.contents.errtxt
+	return ret, bytes(symbol.contents.text), zint.modulematrix(symbol).data
+
+def check (symbol, data, mapped):
+	held = zint.instr(data)
+	sources = [
+		('instr', held, 0),
+		('instr, length', held, len(data)),
+		('bytearray', bytearray(data), len(data)),
+		('mmap', mapped, len(data)),
+		('memoryview', memoryview(data), len(data)),
+		('POINTER(c_ubyte)', cast(held, POINTER(c_ubyte)), len(data)),
+		('c_char_p', c_char_p(data), len(data))
+	]
+	want = encoded(symbol, data, len(data))
+	ok = True
+	for name, source, length in sources:
+		if encoded(symbol, source, length) != want:
+			print('MISMATCH %s encodes differently from bytes' % name)
+			ok = False
+	return ok
+
+def timed (func, args, count):
+	start = time.perf_counter()
+	for _ in range(count):
+		func(*args)
+	return (time.perf_counter() - start) / count * 1e6
+
+def peak (func, payload):
+	tracemalloc.start()
+	tracemalloc.reset_peak()
+	result = func(payload)
+	size = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	del result
+	return size
+
+def main (argv):
+	count = int(argv[1]) if len(argv) > 1 else 2000
+	size = int(argv[2]) if len(argv) > 2 else 3000
+	data = b'1234567890' * (size // 10)
+	mapped = mmap.mmap(-1, len(data))
+	mapped.write(data)
+	cases = [
+		('instr(bytes)', convert_instr, data, lambda: zint.instr(data), 0),
+		('bytes', convert_direct, data, lambda: data, len(data)),
+		('bytearray', convert_direct, bytearray(data), None, len(data)),
+		('mmap', convert_direct, mapped, None, len(data))
+	]
+	symbol = zint.ZBarcode_Create()
+	symbol.contents.symbology = zint.BARCODE_DATAMATRIX
+	print('libzint %d, %d byte DataMatrix payload, %d runs' % (
+		zint.ZBarcode_Version(), len(data), count))
+	if not check(symbol, data, mapped):
+		zint.ZBarcode_Delete(symbol)
+		sys.exit(1)
+	print('%-14s %10s %10s %12s' % ('input', 'adapt', 'encode', 'peak'))
+	for name, convert, payload, make, length in cases:
+		if make is None:
+			make = lambda payload=payload: payload
+		adapt = timed(convert, (payload,), count * 10)
+		def encode ():
+			zint.ZBarcode_Clear(symbol)
+			if zint.ZBarcode_Encode(symbol, make(), length) != 0:
+				raise RuntimeError(symbol.contents.errtxt)
+		elapsed = timed(encode, (), count)
+		print('%-14s %8.2fus %8.1fus %10d B' % (
+			name, adapt, elapsed, peak(convert, payload)))
+	zint.ZBarcode_Delete(symbol)
+	del cases
+	mapped.close()
+
+if __name__ == '__main__':
+	main(sys.argv)
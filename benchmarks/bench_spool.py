@@ -0,0 +1,66 @@
+# Peak RSS of rendering a batch of bitmaps into a Spool against keeping
+# them as bytes in a list, for growing batch sizes.  Each run is a fresh
+# process so ru_maxrss is its own.
+#
+#   python benchmarks/bench_spool.py [count ...]
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+def rss_kb ():
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return rss // 1024 if sys.platform == 'darwin' else rss
+
+def child (mode, count, path):
+	import zint
+	template = zint.SymbolTemplate({'symbology': zint.BARCODE_QRCODE, 'scale': 2.0})
+	symbol = zint.ZBarcode_Create()
+	kept = []
+	spool = zint.Spool(path) if mode == 'spool' else None
+	start = time.perf_counter()
+	for n in range(count):
+		data = b'https://example.com/label/%08d' % n
+		template.apply(symbol)
+		zint.ZBarcode_Encode_and_Buffer(symbol, data, len(data), 0)
+		if spool is not None:
+			spool.append(symbol)
+		else:
+			kept.append(bytes(zint.bitmapview(symbol)))
+	if spool is not None:
+		spool.close()
+		size = os.path.getsize(path)
+	else:
+		size = sum(len(b) for b in kept)
+	elapsed = time.perf_counter() - start
+	zint.ZBarcode_Delete(symbol)
+	print('%d %d %.3f' % (rss_kb(), size, elapsed))
+
+def main (argv):
+	if len(argv) > 1 and argv[1] == '--child':
+		child(argv[2], int(argv[3]), argv[4])
+		return
+	counts = [int(a) for a in argv[1:]] or [1000, 10000, 50000]
+	tmp = tempfile.mkdtemp()
+	path = os.path.join(tmp, 'batch.spool')
+	print('%8s %-6s %10s %10s %8s' % ('frames', 'sink', 'MB', 'peak RSS', 'us/frame'))
+	try:
+		for count in counts:
+			for mode in ('list', 'spool'):
+				out = subprocess.check_output([
+					sys.executable, __file__, '--child', mode, str(count), path])
+				rss, size, elapsed = out.split()
+				print('%8d %-6s %10.1f %8.1fMB %8.1f' % (
+					count, mode, int(size) / 1e6, int(rss) / 1024.0,
+					float(elapsed) / count * 1e6))
+	finally:
+		for name in (path, path + '.idx'):
+			if os.path.exists(name):
+				os.unlink(name)
+		os.rmdir(tmp)
+
+if __name__ == '__main__':
+	main(sys.argv)
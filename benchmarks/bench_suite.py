@@ -0,0 +1,207 @@
+# Latency, throughput and memory of every symbology through each output
+# path: encode (ZBarcode_Encode), buffer (ZBarcode_Encode_and_Buffer),
+# vector (ZBarcode_Encode_and_Buffer_Vector) and print
+# (ZBarcode_Encode_and_Print to a temporary file).
+#
+# Each op is timed on its own, after resetting the symbol.  "ffi" is the
+# median cost of a foreign call that does no work (ZBarcode_ValidID) plus
+# the argument conversion of the source buffer, which is what python-zint
+# adds on top of libzint for one call; "c" is p50 less that.  Symbologies
+# none of the candidate payloads suit are skipped.  Results can be written
+# as JSON and compared with an earlier run:
+#
+#   python benchmarks/bench_suite.py [-n 200] [-b QRCODE -b CODE128]
+#       [-p buffer] [--json run.json] [--compare old.json]
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+import zint
+from zint.zint import _source
+
+# Tried in turn until one encodes without error.  (data, primary)
+candidates = [
+	(b'1234567', None),
+	(b'12345678901', None),
+	(b'123456789012', None),
+	(b'1234567890128', None),
+	(b'[01]12345678901231', None),
+	(b'ABC123', None),
+	(b'ABC1234', None),
+	(b'12345', None),
+	(b'01234567', None),
+	(b'01234565', None),
+	(b'1234', None),
+	(b'A1', None),
+	(b'A12345B', None),
+	(b'A', None),
+	(b'125', None),
+	(b'DAFT', None),
+	(b'9780123456786', None),
+	(b'2GNFLGE30D6201432', None),
+	(b'EE876543216CA', None),
+	(b'01234567094987654321', None),
+	(b'11210012341234567AB19XY1A', None),
+	(b'008182709980000020028101276', None),
+	(b'[21]A12345678', b'331234567890'),
+	(b'[21]A12345678', b'[01]12345678901231'),
+	(b'[21]A12345678', b'1234567'),
+	(b'1Z00004951\x1dUPSN\x1d06X610\x1d159\x1d1234567\x1d1/1\x1d\x1dY\x1d634 ALPHA DR\x1dPITTSBURGH\x1dPA\x1e\x04', b'152382802840001')
+]
+
+def rss_kb ():
+	if resource is None:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# bytes on macOS, kilobytes elsewhere
+	return rss // 1024 if sys.platform == 'darwin' else rss
+
+def symbologies (names):
+	if names:
+		ids = []
+		for name in names:
+			name = name.upper()
+			ids.append(getattr(zint, name if name.startswith('BARCODE_') else 'BARCODE_' + name))
+		return sorted(set(ids))
+	return [s.id for s in zint.registry()]
+
+def payload (symbol, id):
+	for data, primary in candidates:
+		template = zint.SymbolTemplate({'symbology': id, 'primary': primary or b''})
+		template.apply(symbol)
+		if zint.ZBarcode_Encode(symbol, data, len(data)) < zint.ZINT_ERROR_TOO_LONG:
+			return data, primary
+	return None, None
+
+def paths (outdir):
+	ext = '.png'
+	if hasattr(zint, 'ZBarcode_NoPng') and zint.ZBarcode_NoPng():
+		ext = '.gif'
+	result = {
+		'encode': lambda s, d, n: zint.ZBarcode_Encode(s, d, n),
+		'buffer': lambda s, d, n: zint.ZBarcode_Encode_and_Buffer(s, d, n, 0),
+		'print': lambda s, d, n: zint.ZBarcode_Encode_and_Print(s, d, n, 0)
+	}
+	if hasattr(zint, 'ZBarcode_Encode_and_Buffer_Vector'):
+		result['vector'] = lambda s, d, n: zint.ZBarcode_Encode_and_Buffer_Vector(s, d, n, 0)
+	return result, os.path.join(outdir, 'out' + ext).encode()
+
+def percentile (ordered, p):
+	return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def ffi_overhead (data, runs=20000):
+	times = []
+	for _ in range(runs):
+		start = time.perf_counter_ns()
+		_source.from_param(data)
+		zint.ZBarcode_ValidID(0)
+		times.append(time.perf_counter_ns() - start)
+	times.sort()
+	return percentile(times, 0.5)
+
+def run_case (symbol, template, data, call, iterations):
+	# libzint may write back input fields (height, eci for UPNQR), so every
+	# op starts from the template
+	times = []
+	for i in range(iterations + 5):
+		template.apply(symbol)
+		start = time.perf_counter_ns()
+		ret = call(symbol, data, len(data))
+		elapsed = time.perf_counter_ns() - start
+		if ret >= zint.ZINT_ERROR_TOO_LONG:
+			return None, symbol.contents.errtxt.decode('ascii', 'replace')
+		if i >= 5:
+			times.append(elapsed)
+	times.sort()
+	return times, None
+
+def main (argv):
+	parser = argparse.ArgumentParser(prog='bench_suite.py')
+	parser.add_argument('-n', '--iterations', type=int, default=200)
+	parser.add_argument('-b', '--symbology', action='append', default=[])
+	parser.add_argument('-p', '--path', action='append', default=[], choices=['encode', 'buffer', 'vector', 'print'])
+	parser.add_argument('--json', help='write results here')
+	parser.add_argument('--compare', help='earlier --json output to compare p50 against')
+	args = parser.parse_args(argv[1:])
+
+	outdir = tempfile.mkdtemp()
+	calls, outfile = paths(outdir)
+	selected = args.path or [p for p in ('encode', 'buffer', 'vector', 'print') if p in calls]
+	caps = zint.registry()
+	symbol = zint.ZBarcode_Create()
+	results = []
+	print('libzint %d, python-zint %s, %d iterations' % (
+		zint.ZBarcode_Version(), zint.__version__, args.iterations))
+	print('%-18s %-7s %9s %9s %9s %9s %9s %10s %9s' % (
+		'symbology', 'path', 'p50 us', 'p90 us', 'p99 us', 'ffi us', 'c us', 'ops/s', 'rss KB'))
+	try:
+		for id in symbologies(args.symbology):
+			name = caps[id].name if id in caps else str(id)
+			data, primary = payload(symbol, id)
+			if data is None:
+				print('%-18s skipped, no candidate payload encodes' % name)
+				results.append({'symbology': name, 'id': id, 'skipped': True})
+				continue
+			ffi = ffi_overhead(data, 2000)
+			for path in selected:
+				template = zint.SymbolTemplate({
+					'symbology': id, 'primary': primary or b'', 'outfile': outfile
+				})
+				times, error = run_case(symbol, template, data, calls[path], args.iterations)
+				if times is None:
+					print('%-18s %-7s failed: %s' % (name, path, error))
+					results.append({'symbology': name, 'id': id, 'path': path, 'error': error})
+					continue
+				total = sum(times)
+				p50 = percentile(times, 0.5)
+				row = {
+					'symbology': name, 'id': id, 'path': path, 'payload': len(data),
+					'p50_us': p50 / 1e3, 'p90_us': percentile(times, 0.9) / 1e3,
+					'p99_us': percentile(times, 0.99) / 1e3,
+					'ffi_us': ffi / 1e3, 'c_us': max(p50 - ffi, 0) / 1e3,
+					'ops_per_s': len(times) / (total / 1e9), 'rss_kb': rss_kb()
+				}
+				results.append(row)
+				print('%-18s %-7s %9.1f %9.1f %9.1f %9.2f %9.1f %10.0f %9s' % (
+					name, path, row['p50_us'], row['p90_us'], row['p99_us'],
+					row['ffi_us'], row['c_us'], row['ops_per_s'], row['rss_kb']))
+	finally:
+		zint.ZBarcode_Delete(symbol)
+		shutil.rmtree(outdir, ignore_errors=True)
+
+	run = {
+		'libzint': zint.ZBarcode_Version(), 'python_zint': zint.__version__,
+		'python': platform.python_version(), 'platform': platform.platform(),
+		'iterations': args.iterations, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'results': results
+	}
+	if args.json:
+		with open(args.json, 'w') as f:
+			json.dump(run, f, indent=1)
+	if args.compare:
+		with open(args.compare) as f:
+			old = json.load(f)
+		before = dict(((r['symbology'], r['path']), r['p50_us']) for r in old['results'] if 'p50_us' in r)
+		print('\ncompared with libzint %d, python-zint %s (%s)' % (
+			old['libzint'], old['python_zint'], old['time']))
+		for r in results:
+			key = (r['symbology'], r.get('path'))
+			if 'p50_us' in r and key in before:
+				print('%-18s %-7s %9.1f -> %9.1f us  %+6.1f%%' % (
+					key[0], key[1], before[key], r['p50_us'],
+					(r['p50_us'] / before[key] - 1) * 100))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
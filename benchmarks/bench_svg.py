@@ -0,0 +1,126 @@
+# Size and time of write_svg() against libzint's own SVG (ZBarcode_Print()
+# to a temporary file) for large matrix symbols.  First every path
+# write_svg() emits is read back and its nonzero fill checked against the
+# vector's rectangles at the centre of each cell of the grid their edges
+# make.  Exits non-zero if they differ or a payload fails to encode.
+#
+#   python benchmarks/bench_svg.py [count] [size]
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import zint
+
+# Payload bytes per symbology, near the largest each takes; a size on the
+# command line replaces them all
+sizes = {
+	'BARCODE_QRCODE': 1500, 'BARCODE_DATAMATRIX': 1500,
+	'BARCODE_PDF417': 1000, 'BARCODE_AZTEC': 1500
+}
+
+def subpaths (d):
+	# Corners of each subpath of an M/m/h/v/z path
+	loops = []
+	x = y = sx = sy = 0.0
+	for op, args in re.findall(r'([MmhvZz])([^MmhvZz]*)', d):
+		values = [float(v) for v in args.split()]
+		if op in 'Mm':
+			if op == 'm':
+				x, y = sx + values[0], sy + values[1]
+			else:
+				x, y = values
+			sx, sy = x, y
+			loops.append([(x, y)])
+		elif op == 'h':
+			x += values[0]
+			loops[-1].append((x, y))
+		elif op == 'v':
+			y += values[0]
+			loops[-1].append((x, y))
+		else:
+			x, y = sx, sy
+	return loops
+
+def covered (rects, px, py):
+	return any(x <= px < x + w and y <= py < y + h for x, y, w, h in rects)
+
+def check (symbol):
+	arrays = zint.vectorarrays(symbol)
+	r = arrays.rectangles
+	svg = zint.svgbytes(symbol).decode('utf-8')
+	ok = True
+	for colour in sorted(set(r['colour'])):
+		rects = [
+			(r['x'][i], r['y'][i], r['width'][i], r['height'][i])
+			for i in range(len(r['x'])) if r['colour'][i] == colour
+		]
+		if colour == -1:
+			d = re.search(r'<path d="([^"]*)"/>', svg).group(1)
+		else:
+			d = re.search(r'<path d="([^"]*)" fill="#%s"/>' % zint.vector._rect_colours[colour], svg).group(1)
+		# Vertical sides with their direction, for the winding number of
+		# each band's cells left to right
+		sides = []
+		for loop in subpaths(d):
+			for (x0, y0), (x1, y1) in zip(loop, loop[1:] + loop[:1]):
+				if x0 == x1:
+					sides.append((x0, min(y0, y1), max(y0, y1), y1 < y0 and 1 or -1))
+		xs = sorted(set([x for x, y, w, h in rects] + [x + w for x, y, w, h in rects]))
+		ys = sorted(set([y for x, y, w, h in rects] + [y + h for x, y, w, h in rects]))
+		for y0, y1 in zip(ys, ys[1:]):
+			cy = (y0 + y1) / 2.0
+			row = [(x, s) for x, top, bottom, s in sides if top < cy < bottom]
+			band = [t for t in rects if t[1] <= cy < t[1] + t[3]]
+			for x0, x1 in zip(xs, xs[1:]):
+				cx = (x0 + x1) / 2.0
+				filled = sum(s for x, s in row if x < cx) != 0
+				if filled != covered(band, cx, cy):
+					ok = False
+	return ok
+
+def timed (func, count):
+	start = time.perf_counter()
+	for _ in range(count):
+		func()
+	return (time.perf_counter() - start) / count * 1e3
+
+def main (argv):
+	count = int(argv[1]) if len(argv) > 1 else 20
+	tmp = tempfile.mkdtemp()
+	outfile = os.path.join(tmp, 'out.svg')
+	print('libzint %d, %d runs' % (zint.ZBarcode_Version(), count))
+	print('%-20s %6s %8s %10s %10s %10s %10s %10s' % (
+		'symbology', 'bytes', 'rects', 'libzint', 'merge', 'outline', 'libzint', 'outline'))
+	bad = 0
+	for name, size in sorted(sizes.items()):
+		if len(argv) > 2:
+			size = int(argv[2])
+		data = bytes(bytearray((n * 7 + 65) % 256 for n in range(size)))
+		symbol = zint.ZBarcode_Create()
+		symbol.contents.symbology = getattr(zint, name)
+		symbol.contents.outfile = outfile.encode()
+		if zint.ZBarcode_Encode_and_Buffer_Vector(symbol, data, len(data), 0) >= zint.ZINT_ERROR_TOO_LONG:
+			print('%-20s %6d %s' % (name, size, symbol.contents.errtxt.decode()))
+			zint.ZBarcode_Delete(symbol)
+			bad += 1
+			continue
+		if not check(symbol):
+			print('MISMATCH %s outline fills differently from the rectangles' % name)
+			bad += 1
+		zint.ZBarcode_Print(symbol, 0)
+		own = os.path.getsize(outfile)
+		rects = len(zint.vectorarrays(symbol).rectangles['x'])
+		print('%-20s %6d %8d %9dB %9dB %9dB %8.2fms %8.2fms' % (
+			name, size, rects, own, len(zint.svgbytes(symbol, merge=False)), len(zint.svgbytes(symbol)),
+			timed(lambda: zint.ZBarcode_Print(symbol, 0), count),
+			timed(lambda: zint.svgbytes(symbol), count)))
+		zint.ZBarcode_Delete(symbol)
+	shutil.rmtree(tmp)
+	return 1 if bad else 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -0,0 +1,84 @@
+# Checks that batch encoding gives exactly what a fresh symbol does.
+# encode_many() and encode_parallel()'s workers reuse a symbol for every
+# item, and libzint writes some input fields (height, border_width,
+# option_2) back into it, so each result is compared with one from a newly
+# created symbol: return code, errtxt, module matrix and bitmap.  The
+# symbologies are ones where those written-back fields change the next
+# encode.  Exits non-zero on any difference.
+#
+#   python benchmarks/check_batch.py [-n 40]
+
+import argparse
+import hashlib
+import sys
+
+import zint
+
+symbologies = [
+	'BARCODE_PDF417', 'BARCODE_CODE16K', 'BARCODE_RSS_EXPSTACK',
+	'BARCODE_CODABLOCKF', 'BARCODE_MICROPDF417', 'BARCODE_QRCODE'
+]
+
+def payloads (symbology, count):
+	# Lengths vary so consecutive items need different row counts
+	for n in range(count):
+		if symbology == zint.BARCODE_RSS_EXPSTACK:
+			yield b'[01]98898765432106[3103]%06d[10]' % n + b'A' * (n % 12 + 1)
+		else:
+			yield (b'item %d ' % n) + b'0123456789ABCDEF' * (n % 9 + 1)
+
+def digest (symbol):
+	h = hashlib.sha1(zint.modulematrix(symbol).data)
+	h.update(bytes(zint.bitmapview(symbol)))
+	return h.hexdigest()
+
+def fresh (template, item):
+	data, options = item if isinstance(item, tuple) else (item, {})
+	symbol = zint.ZBarcode_Create()
+	try:
+		for name, value in list(template.items()) + list(options.items()):
+			setattr(symbol.contents, name, value)
+		ret = zint.ZBarcode_Encode_and_Buffer(symbol, data, len(data), 0)
+		value = digest(symbol) if ret < zint.ZINT_ERROR_TOO_LONG else None
+		return ret, symbol.contents.errtxt if ret else b'', value
+	finally:
+		zint.ZBarcode_Delete(symbol)
+
+def results (batch):
+	return [(r.ret, r.errtxt, r.value) for r in batch]
+
+# Small chunks so chunk boundaries fall between items that differ.  Each
+# batch runs with the template as options and as one SymbolTemplate shared
+# by all the batches of a symbology.
+batches = [
+	('encode_many', lambda items, template: zint.encode_many(items, template, extract=digest)),
+	('threads', lambda items, template: zint.encode_parallel(
+		items, template, extract=digest, workers=2, chunksize=3)),
+	('processes', lambda items, template: zint.encode_parallel(
+		items, template, extract=digest, workers=2, chunksize=3, processes=True))
+]
+
+def main (argv):
+	parser = argparse.ArgumentParser(prog='check_batch.py')
+	parser.add_argument('-n', '--count', type=int, default=40)
+	args = parser.parse_args(argv[1:])
+	bad = 0
+	for name in symbologies:
+		if not hasattr(zint, name):
+			continue
+		template = {'symbology': getattr(zint, name), 'scale': 1.0}
+		items = list(payloads(template['symbology'], args.count))
+		# Every third item overrides a field, which must not carry over
+		items = [(data, {'scale': 2.0}) if i % 3 == 2 else data for i, data in enumerate(items)]
+		expected = [fresh(template, item) for item in items]
+		stamped = zint.SymbolTemplate(template)
+		for label, batch in batches:
+			for kind, given in (('', template), (' template', stamped)):
+				got = results(batch(items, given))
+				wrong = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+				print('%-22s %-20s %d items, %d differ' % (name, label + kind, len(items), len(wrong)))
+				bad += len(wrong)
+	return 1 if bad else 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -0,0 +1,55 @@
+# Checks that RenderCache serves repeats of an identical request from the
+# cache.  libzint writes some input fields back into the symbol on encode
+# (border_width and output_options for CODE16K and CODABLOCKF, option_2
+# for MICROPDF417), so each repeat must still find the first entry, with
+# the same bitmap, and leave the symbol as it was configured.  Exits
+# non-zero on any miss after the first request.
+#
+#   python benchmarks/check_cache.py [-n 3]
+
+import argparse
+import sys
+
+import zint
+
+symbologies = [
+	'BARCODE_CODE16K', 'BARCODE_CODABLOCKF', 'BARCODE_MICROPDF417',
+	'BARCODE_PDF417', 'BARCODE_QRCODE'
+]
+
+def main (argv):
+	parser = argparse.ArgumentParser(prog='check_cache.py')
+	parser.add_argument('-n', '--count', type=int, default=3)
+	args = parser.parse_args(argv[1:])
+	data = b'Repeated request 0123456789'
+	bad = 0
+	for name in symbologies:
+		if not hasattr(zint, name):
+			continue
+		cache = zint.RenderCache()
+		symbol = zint.ZBarcode_Create()
+		symbol.contents.symbology = getattr(zint, name)
+		key = zint.symbol_key(symbol, data, 'buffer')
+		values = []
+		for n in range(args.count):
+			result = cache.buffer(symbol, data)
+			if result.value is None:
+				print('%-22s %s' % (name, result.errtxt.decode()))
+				bad += 1
+				break
+			values.append(result.value)
+		same_key = zint.symbol_key(symbol, data, 'buffer') == key
+		zint.ZBarcode_Delete(symbol)
+		stats = cache.stats()
+		ok = (
+			same_key and stats['misses'] == 1 and
+			stats['hits'] == len(values) - 1 and len(cache.backend) == 1 and
+			values.count(values[0]) == len(values)
+		)
+		print('%-22s %d hits, %d misses, %d entries%s' % (
+			name, stats['hits'], stats['misses'], len(cache.backend), '' if ok else '  WRONG'))
+		bad += not ok
+	return 1 if bad else 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
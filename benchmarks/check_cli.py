@@ -0,0 +1,74 @@
+# Checks that python -m zint reports bad rows and carries on.  A JSON Lines
+# file mixing good rows with ones that can't be read (malformed JSON, no
+# data, a name with a path, an unknown field or symbology, a bad value) or
+# that libzint rejects is encoded into a directory: every good row must be
+# written, every bad one reported on stderr with its row number, nothing
+# written outside the directory and the exit status 1.  Exits non-zero
+# otherwise.
+#
+#   python benchmarks/check_cli.py
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from zint.__main__ import main as cli
+
+good = [
+	{'data': 'first', 'name': 'first'},
+	{'data': 'plain'},
+	{'data': 'scaled', 'scale': '2'},
+	{'data': 'last', 'name': 'last'}
+]
+bad = [
+	'{"data": "unterminated',
+	{'name': 'no-data'},
+	{'data': 'x', 'name': '../evil'},
+	{'data': 'x', 'colour': 'red'},
+	{'data': 'x', 'symbology': 'NO_SUCH'},
+	{'data': 'x', 'scale': 'big'},
+	{'data': 'not digits', 'symbology': 'EANX'}
+]
+
+def main (argv):
+	tmp = tempfile.mkdtemp()
+	try:
+		# Good and bad rows interleaved, bad ones last
+		rows = []
+		for i in range(max(len(good), len(bad))):
+			if i < len(good):
+				rows.append(good[i])
+			if i < len(bad):
+				rows.append(bad[i])
+		path = os.path.join(tmp, 'rows.jsonl')
+		with open(path, 'w') as f:
+			for row in rows:
+				f.write((row if isinstance(row, str) else json.dumps(row)) + '\n')
+		outdir = os.path.join(tmp, 'out')
+		stderr = io.StringIO()
+		with contextlib.redirect_stderr(stderr):
+			ret = cli([path, '-o', outdir, '-j', '2', '--chunksize', '2'])
+		report = stderr.getvalue()
+		sys.stdout.write(report)
+		want = set()
+		for n, row in enumerate(rows):
+			if row in good:
+				want.add('%s.png' % row.get('name', '%08d' % n))
+		ok = ret == 1
+		ok &= set(os.listdir(outdir)) == want
+		ok &= set(os.listdir(tmp)) == set(['rows.jsonl', 'out'])
+		for n, row in enumerate(rows):
+			if row in bad:
+				ok &= ('row %d: ' % n) in report
+		ok &= '%d encoded, %d failed' % (len(good), len(bad)) in report
+		print('exit %d, %d written: %s' % (ret, len(os.listdir(outdir)), ok and 'ok' or 'WRONG'))
+		return 0 if ok else 1
+	finally:
+		shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
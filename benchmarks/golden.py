@@ -0,0 +1,205 @@
+# Golden output and encode time checks for every symbology.  Each case in
+# golden/corpus.json is encoded with the installed libzint and its return
+# code, errtxt and SHA-1 hashes of encoded_data (with rows, width and
+# row_height), of the bitmap and of the vector (where the library has
+# vector output) are compared with a baseline recorded earlier, together
+# with the median ZBarcode_Encode() time.
+#
+# Baselines live next to the corpus as golden/libzint-<version>.json.  The
+# check uses the one for the installed version or, when upgrading, the
+# newest older one, so an output change or slowdown after moving to a new
+# libzint shows up here.  Symbologies the installed version doesn't have
+# (see the version gates in zint/zint.py) are skipped.  Encode times are
+# only comparable on the machine that recorded them.
+#
+#   python benchmarks/golden.py --record         write the baseline
+#   python benchmarks/golden.py [--baseline FILE] [--slower 1.5] [--no-timing]
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import re
+import struct
+import sys
+import time
+
+import zint
+from zint.__main__ import _option
+from zint.vector import _columns
+
+here = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+def load_corpus (path):
+	with open(path) as f:
+		corpus = json.load(f)
+	cases = []
+	for case in corpus['cases']:
+		if 'hex' in case:
+			data = bytes.fromhex(case['hex'])
+		else:
+			data = case['data'].encode('utf-8')
+		cases.append((case['id'], case['symbology'], data, case.get('options', {})))
+	return cases
+
+def _le (values):
+	# array.array columns in little endian whatever the host
+	if sys.byteorder == 'big':
+		values = values.__copy__()
+		values.byteswap()
+	return values.tobytes()
+
+def hash_encoded (symbol):
+	c = symbol.contents
+	matrix = zint.modulematrix(symbol)
+	h = hashlib.sha1(struct.pack('<ii', c.rows, c.width))
+	h.update(struct.pack('<%df' % c.rows, *matrix.row_height))
+	h.update(matrix.data)
+	return h.hexdigest()
+
+def hash_bitmap (symbol):
+	c = symbol.contents
+	h = hashlib.sha1(struct.pack('<ii', c.bitmap_width, c.bitmap_height))
+	h.update(bytes(zint.bitmapview(symbol)))
+	return h.hexdigest()
+
+def hash_vector (symbol):
+	arrays = zint.vectorarrays(symbol)
+	h = hashlib.sha1(struct.pack('<ff', arrays.width, arrays.height))
+	for kind in ('rectangles', 'hexagons', 'circles', 'strings'):
+		columns = getattr(arrays, kind)
+		h.update(kind.encode('ascii'))
+		for name, code in _columns[kind]:
+			h.update(_le(columns[name]))
+		if kind == 'strings':
+			h.update('\0'.join(columns['text']).encode('utf-8'))
+	return h.hexdigest()
+
+def run_case (symbol, symbology, data, options, runs):
+	template = zint.SymbolTemplate(dict(
+		((k, _option(k, v)) for k, v in options.items()), symbology=getattr(zint, symbology)))
+	times = []
+	for _ in range(runs):
+		template.apply(symbol)
+		start = time.perf_counter_ns()
+		ret = zint.ZBarcode_Encode(symbol, data, len(data))
+		times.append(time.perf_counter_ns() - start)
+	times.sort()
+	result = {
+		'ret': ret,
+		'errtxt': symbol.contents.errtxt.decode('utf-8', 'replace') if ret else '',
+		'encode_us': round(times[len(times) // 2] / 1e3, 2)
+	}
+	if ret >= zint.ZINT_ERROR_TOO_LONG:
+		return result
+	result['encoded'] = hash_encoded(symbol)
+	if zint.ZBarcode_Buffer(symbol, 0) < zint.ZINT_ERROR_TOO_LONG:
+		result['bitmap'] = hash_bitmap(symbol)
+	if hasattr(zint, 'ZBarcode_Buffer_Vector'):
+		if zint.ZBarcode_Buffer_Vector(symbol, 0) < zint.ZINT_ERROR_TOO_LONG:
+			result['vector'] = hash_vector(symbol)
+	return result
+
+def baseline_path (version):
+	return os.path.join(here, 'libzint-%d.json' % version)
+
+def find_baseline (version):
+	# This version's, or the newest before it
+	found = []
+	for path in glob.glob(os.path.join(here, 'libzint-*.json')):
+		m = re.search(r'libzint-(\d+)\.json$', path)
+		if m and int(m.group(1)) <= version:
+			found.append((int(m.group(1)), path))
+	return max(found)[1] if found else None
+
+def check (args, version, cases, symbol):
+	results = {}
+	skipped = []
+	for case_id, symbology, data, options in cases:
+		if not hasattr(zint, symbology) or not zint.ZBarcode_ValidID(getattr(zint, symbology)):
+			skipped.append(case_id)
+			continue
+		results[case_id] = run_case(symbol, symbology, data, options, args.runs)
+	if args.record:
+		path = args.baseline or baseline_path(version)
+		with open(path, 'w') as f:
+			f.write(json.dumps({
+				'libzint': version, 'python_zint': zint.__version__,
+				'python': platform.python_version(), 'platform': platform.platform(),
+				'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+			}, sort_keys=True)[:-1] + ', "results": {\n')
+			f.write(',\n'.join(
+				'%s: %s' % (json.dumps(k), json.dumps(results[k], sort_keys=True))
+				for k in sorted(results)))
+			f.write('\n}}\n')
+		print('recorded %d cases (%d skipped) for libzint %d in %s' % (
+			len(results), len(skipped), version, path))
+		return 0
+
+	path = args.baseline or find_baseline(version)
+	if path is None:
+		print('no baseline for libzint %d or older in %s; run with --record' % (version, here))
+		return 1
+	with open(path) as f:
+		baseline = json.load(f)
+	print('libzint %d against the libzint %d baseline (%s)' % (
+		version, baseline['libzint'], os.path.basename(path)))
+	expected = baseline['results']
+	cases_by_id = dict((c[0], c[1:]) for c in cases)
+	changed = slower = new = 0
+	for case_id in sorted(results):
+		got = results[case_id]
+		want = expected.get(case_id)
+		if want is None:
+			new += 1
+			continue
+		# Vector output only counts where both libraries have it
+		keys = [k for k in ('ret', 'errtxt', 'encoded', 'bitmap', 'vector') if k in want or k in got]
+		if 'vector' not in want or 'vector' not in got:
+			keys = [k for k in keys if k != 'vector']
+		diff = [k for k in keys if got.get(k) != want.get(k)]
+		if diff:
+			changed += 1
+			print('CHANGED %-24s %s' % (case_id, ', '.join(diff)))
+			if 'ret' in diff or 'errtxt' in diff:
+				print('        was %d %r, now %d %r' % (want['ret'], want['errtxt'], got['ret'], got['errtxt']))
+		limit = want['encode_us'] * args.slower + 1
+		if not args.no_timing and got['encode_us'] > limit:
+			# Timed again, longer, before it counts: one busy moment on the
+			# machine shouldn't fail the check
+			again = run_case(symbol, *cases_by_id[case_id], runs=args.runs * 4)
+			got['encode_us'] = min(got['encode_us'], again['encode_us'])
+		if not args.no_timing and got['encode_us'] > limit:
+			slower += 1
+			print('SLOWER  %-24s %.1fus -> %.1fus' % (case_id, want['encode_us'], got['encode_us']))
+	missing = [k for k in expected if k not in results and k not in skipped]
+	print('%d cases: %d changed, %d slower, %d not in baseline, %d skipped, %d baseline cases not run' % (
+		len(results), changed, slower, new, len(skipped), len(missing)))
+	return 1 if changed or slower else 0
+
+
+def main (argv):
+	parser = argparse.ArgumentParser(prog='golden.py')
+	parser.add_argument('--corpus', default=os.path.join(here, 'corpus.json'))
+	parser.add_argument('--baseline', help='default: for the installed libzint')
+	parser.add_argument('--record', action='store_true', help='write the baseline instead of checking')
+	parser.add_argument('-n', '--runs', type=int, default=25, help='encodes timed per case')
+	parser.add_argument('--slower', type=float, default=1.5, help='fail when this many times slower')
+	parser.add_argument('--no-timing', action='store_true')
+	parser.add_argument('-k', '--only', help='regular expression selecting case ids')
+	args = parser.parse_args(argv[1:])
+
+	version = zint.ZBarcode_Version()
+	cases = load_corpus(args.corpus)
+	if args.only:
+		cases = [c for c in cases if re.search(args.only, c[0])]
+	symbol = zint.ZBarcode_Create()
+	try:
+		return check(args, version, cases, symbol)
+	finally:
+		zint.ZBarcode_Delete(symbol)
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
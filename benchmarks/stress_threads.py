@@ -0,0 +1,134 @@
+# Encodes the same inputs serially and then from many threads at once, each
+# thread with its own handle from LocalSymbols, and checks every result is
+# bit-identical: return code, errtxt, bitmap and module matrix.  With
+# --debug the run is repeated under zint.threads' debug mode, which must
+# stay quiet, and a handle shared between threads must be caught.  Exits
+# non-zero on any difference.
+#
+#   python benchmarks/stress_threads.py [-t 16] [-n 2000] [--debug]
+
+import argparse
+import hashlib
+import sys
+import threading
+import time
+
+import zint
+from zint import threads
+
+symbologies = [
+	(zint.BARCODE_QRCODE, b'https://example.com/item/%06d'),
+	(zint.BARCODE_DATAMATRIX, b'LOT%06d-EXP2030'),
+	(zint.BARCODE_CODE128, b'SHIP%06d'),
+	(zint.BARCODE_PDF417, b'manifest %06d, pallets 1-40, dock 7, carrier XYZ'),
+	(zint.BARCODE_AZTEC, b'ticket-%06d'),
+	(zint.BARCODE_EANX, b'%07d'),
+	# Too long for EAN, so errtxt is compared too
+	(zint.BARCODE_EANX, b'%020d')
+]
+
+def inputs (count):
+	for n in range(count):
+		symbology, pattern = symbologies[n % len(symbologies)]
+		yield symbology, pattern % (n % 1000000)
+
+def digest (symbol, symbology, data):
+	symbol.contents.symbology = symbology
+	ret = zint.ZBarcode_Encode_and_Buffer(symbol, data, len(data), 0)
+	h = hashlib.sha1()
+	h.update(b'%d:' % ret)
+	h.update(symbol.contents.errtxt)
+	if ret < zint.ZINT_ERROR_TOO_LONG:
+		h.update(zint.modulematrix(symbol).data)
+		h.update(bytes(zint.bitmapview(symbol)))
+	return h.digest()
+
+def serial (items):
+	# Reset as LocalSymbols.borrow() does; libzint writes back height
+	template = zint.SymbolTemplate()
+	symbol = zint.ZBarcode_Create()
+	try:
+		results = []
+		for symbology, data in items:
+			template.apply(symbol)
+			results.append(digest(symbol, symbology, data))
+		return results
+	finally:
+		zint.ZBarcode_Delete(symbol)
+
+def concurrent (items, nthreads):
+	local = zint.LocalSymbols()
+	results = [None] * len(items)
+	errors = []
+	start = threading.Barrier(nthreads)
+
+	def worker (offset):
+		try:
+			start.wait()
+			for i in range(offset, len(items), nthreads):
+				symbology, data = items[i]
+				with local.borrow() as symbol:
+					results[i] = digest(symbol, symbology, data)
+		except Exception as e:
+			errors.append(e)
+
+	workers = [threading.Thread(target=worker, args=(t,)) for t in range(nthreads)]
+	for t in workers:
+		t.start()
+	for t in workers:
+		t.join()
+	local.close()
+	if errors:
+		raise errors[0]
+	return results
+
+def shared_handle_caught ():
+	symbol = zint.ZBarcode_Create()
+	caught = []
+
+	def other ():
+		try:
+			zint.ZBarcode_Encode(symbol, b'x', 1)
+		except RuntimeError as e:
+			caught.append(e)
+
+	t = threading.Thread(target=other)
+	t.start()
+	t.join()
+	zint.ZBarcode_Delete(symbol)
+	return bool(caught)
+
+def run (items, nthreads, label):
+	begin = time.perf_counter()
+	expected = serial(items)
+	middle = time.perf_counter()
+	got = concurrent(items, nthreads)
+	end = time.perf_counter()
+	bad = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+	print('%-8s %d encodes: serial %.2fs, %d threads %.2fs, %d mismatches' % (
+		label, len(items), middle - begin, nthreads, end - middle, len(bad)))
+	for i in bad[:10]:
+		print('  mismatch at %d: %r' % (i, items[i]))
+	return not bad
+
+def main (argv):
+	parser = argparse.ArgumentParser(prog='stress_threads.py')
+	parser.add_argument('-t', '--threads', type=int, default=16)
+	parser.add_argument('-n', '--count', type=int, default=2000)
+	parser.add_argument('--debug', action='store_true', help='also run under zint.threads debug mode')
+	args = parser.parse_args(argv[1:])
+	items = list(inputs(args.count))
+	ok = run(items, args.threads, 'plain')
+	if args.debug:
+		threads.set_debug(True)
+		try:
+			ok = run(items, args.threads, 'debug') and ok
+			caught = shared_handle_caught()
+			print('shared handle %s' % ('caught' if caught else 'NOT caught'))
+			ok = ok and caught
+		finally:
+			threads.set_debug(False)
+	return 0 if ok else 1
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
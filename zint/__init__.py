@@ -1 +1,62 @@
-from .zint import *
+import sys
+
+# Nothing is imported up front, not even __version__.  libzint is loaded
+# when the first name from .zint is looked up, and the helper modules (and
+# the asyncio, concurrent.futures etc. they pull in) when one of their
+# names is.  Resolved names are stored in the package so __getattr__ only
+# runs once per name.  __all__ holds only the names from .zint, so
+# "from zint import *" loads no helper module; theirs are still attributes
+# of the package and listed by dir().
+_lazy = {
+	'matrix': ('ModuleMatrix', 'modulearray', 'modulematrix'),
+	'pool': ('SymbolPool',),
+	'batch': ('EncodeResult', 'encode_many'),
+	'parallel': ('bitmap_copy', 'encode_parallel'),
+	'cache': ('DirectoryCache', 'MemoryCache', 'RenderCache', 'symbol_key'),
+	'image': ('encode_bytes', 'epsbytes', 'pdfbytes', 'pngbytes', 'svgbytes'),
+	'vector': (
+		'VectorArrays', 'merge_rects', 'outline_rects', 'vectorarrays',
+		'write_pdf', 'write_pdf_content', 'write_svg'
+	),
+	'aio': ('AsyncEncoder', 'aencode'),
+	'caps': ('Registry', 'Symbology', 'load_registry', 'registry'),
+	'sheet': ('Sheet', 'impose'),
+	'metrics': ('CallEvent', 'Metrics', 'instrument', 'instrumented', 'uninstrument'),
+	'sizing': ('Fit', 'Sizer'),
+	'raster': ('Raster', 'bitmapraster', 'moduleraster'),
+	'printer': ('EPLWriter', 'EscPosWriter', 'ZPLWriter'),
+	'threads': ('LocalSymbols',),
+	'spool': ('Frame', 'Spool', 'SpoolReader')
+}
+_origin = dict((name, module) for module, names in _lazy.items() for name in names)
+
+def _module (name):
+	# The import statement's own machinery, without loading importlib
+	name = '%s.%s' % (__name__, name)
+	__import__(name)
+	return sys.modules[name]
+
+def __getattr__ (name):
+	if name == '__all__':
+		# Asked for by "from zint import *", which then looks up every
+		# name; copying them all here saves a __getattr__ call for each
+		module = _module('zint')
+		value = list(module.__all__)
+		globals().update((n, getattr(module, n)) for n in value)
+	elif name == 'zint' or name in _lazy:
+		return _module(name)
+	elif name == '__version__':
+		value = _module('_version').__version__
+	elif name.startswith('__'):
+		raise AttributeError("module %r has no attribute %r" % (__name__, name))
+	else:
+		module = _module(_origin.get(name, 'zint'))
+		try:
+			value = getattr(module, name)
+		except AttributeError:
+			raise AttributeError("module %r has no attribute %r" % (__name__, name))
+	globals()[name] = value
+	return value
+
+def __dir__ ():
+	return sorted(set(globals()) | set(_module('zint').__all__) | set(_origin))
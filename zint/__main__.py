@@ -0,0 +1,265 @@
+# Bulk generator: python -m zint rows.csv -o out/ --symbology QRCODE
+#
+# Rows come from CSV (with a header) or JSON Lines and are read as they are
+# encoded.  Each row has a data column with the payload, an optional name
+# column for the output file name and any zint_symbol input field as a
+# per-row option.  Images go to a directory, a .tar/.tar.gz/.zip archive or
+# a tar stream on stdout (-o -).  With --checkpoint the number of rows done
+# is saved as it goes and a rerun skips them.  A row that cannot be read
+# or encoded is reported on stderr with its number and counted as failed,
+# and the rest carry on.
+
+import argparse
+from collections import deque
+import csv
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from ctypes import Array, c_char
+from itertools import chain, islice
+
+from . import zint as _zint
+from .zint import ZINT_ERROR_TOO_LONG, _symbol_input_fields, zint_symbol
+from .parallel import encode_parallel
+from . import image
+
+_field_types = dict(zint_symbol._fields_)
+
+def _symbology (value):
+	if value.isdigit():
+		return int(value)
+	name = value.upper()
+	if not name.startswith('BARCODE_'):
+		name = 'BARCODE_' + name
+	if not hasattr(_zint, name):
+		raise ValueError('unknown symbology %r' % value)
+	return getattr(_zint, name)
+
+# Converts an option from text (CSV, the command line) or JSON to what the
+# zint_symbol field takes
+def _option (name, value):
+	if name not in _symbol_input_fields:
+		raise ValueError('zint_symbol has no input field %r' % name)
+	if name == 'symbology' and isinstance(value, str):
+		return _symbology(value)
+	kind = _field_types[name]
+	if issubclass(kind, Array) and kind._type_ is c_char:
+		return value.encode('utf-8') if isinstance(value, str) else value
+	code = getattr(kind, '_type_', None)
+	if code in ('f', 'd'):
+		return float(value)
+	if code in ('i', 'I'):
+		return int(value)
+	raise ValueError('field %r cannot be set here' % name)
+
+# CSV rows as dicts, JSON Lines as the text of each line, which _items()
+# parses so that a malformed line only fails its own row
+def _rows (f, kind):
+	if kind == 'csv':
+		for row in csv.DictReader(f):
+			yield row
+	else:
+		for line in f:
+			if line.strip():
+				yield line
+
+def _name (name):
+	# Output names come from the input, so they must stay inside the output
+	# directory or archive
+	name = str(name)
+	if name in ('.', '..') or any(c in name for c in ('/', '\\', '\0')):
+		raise ValueError('name %r must be a plain file name' % name)
+	return name
+
+def _item (n, row):
+	if isinstance(row, str):
+		row = json.loads(row)
+	row = dict(row)
+	data = row.pop('data', None)
+	if data is None:
+		raise ValueError('no data')
+	name = row.pop('name', None)
+	name = _name(name) if name else '%08d' % n
+	options = dict((k, _option(k, v)) for k, v in row.items() if v not in ('', None))
+	if not isinstance(data, bytes):
+		data = str(data).encode('utf-8')
+	return name, (data, options) if options else data
+
+def _items (rows, names, ext):
+	# Row to encode_parallel() input.  (row number, output name, error) is
+	# queued in names since results come back in input order; a row that
+	# fails here is queued with its error and not encoded.
+	for n, row in rows:
+		try:
+			name, item = _item(n, row)
+		except (TypeError, ValueError) as e:
+			names.append((n, None, str(e)))
+			continue
+		names.append((n, name + ext, None))
+		yield item
+
+class _Directory(object):
+	def __init__ (self, path, resume):
+		os.makedirs(path, exist_ok=True)
+		self.path = path
+
+	def write (self, name, data):
+		with open(os.path.join(self.path, name), 'wb') as f:
+			f.write(data)
+
+	def flush (self):
+		pass
+
+	def close (self):
+		pass
+
+class _Tar(object):
+	def __init__ (self, path, resume):
+		if path == '-':
+			self.tar = tarfile.open(fileobj=sys.stdout.buffer, mode='w|')
+		elif path.endswith('.tar') and resume and os.path.exists(path):
+			self.tar = tarfile.open(path, 'a')
+		elif resume and os.path.exists(path):
+			raise ValueError('cannot resume into compressed %s' % path)
+		else:
+			self.tar = tarfile.open(path, 'w:gz' if path.endswith('gz') else 'w')
+		self.fileobj = self.tar.fileobj
+
+	def write (self, name, data):
+		info = tarfile.TarInfo(name)
+		info.size = len(data)
+		info.mtime = time.time()
+		self.tar.addfile(info, io.BytesIO(data))
+
+	def flush (self):
+		self.fileobj.flush()
+
+	def close (self):
+		self.tar.close()
+
+class _Zip(object):
+	def __init__ (self, path, resume):
+		mode = 'a' if resume and os.path.exists(path) else 'w'
+		# Images are compressed already
+		self.zip = zipfile.ZipFile(path, mode, zipfile.ZIP_STORED)
+
+	def write (self, name, data):
+		self.zip.writestr(name, data)
+
+	def flush (self):
+		pass
+
+	def close (self):
+		self.zip.close()
+
+def _output (path, resume):
+	if path == '-' or path.endswith(('.tar', '.tar.gz', '.tgz')):
+		return _Tar(path, resume)
+	if path.endswith('.zip'):
+		return _Zip(path, resume)
+	return _Directory(path, resume)
+
+def _load_checkpoint (path, source):
+	try:
+		with open(path) as f:
+			state = json.load(f)
+	except (IOError, OSError, ValueError):
+		return 0
+	if state.get('input') != source:
+		raise ValueError('checkpoint %s is for %s' % (path, state.get('input')))
+	return state['done']
+
+def _save_checkpoint (path, source, done):
+	tmp = path + '.tmp'
+	with open(tmp, 'w') as f:
+		json.dump({'input': source, 'done': done}, f)
+	os.replace(tmp, path)
+
+_formats = {
+	'png': ('buffer', image.pngbytes),
+	'svg': ('vector', image.svgbytes),
+	'eps': ('vector', image.epsbytes),
+	'pdf': ('vector', image.pdfbytes)
+}
+
+def main (argv=None):
+	parser = argparse.ArgumentParser(prog='python -m zint', description='Encode rows of a CSV or JSON Lines file into images.')
+	parser.add_argument('input', help='CSV or JSONL file, - for stdin')
+	parser.add_argument('-o', '--output', required=True, help='directory, .tar, .tar.gz, .zip or - for a tar stream on stdout')
+	parser.add_argument('-f', '--format', default='png', choices=sorted(
+		k for k, v in _formats.items() if v[0] == 'buffer' or hasattr(_zint, 'zint_vector')))
+	parser.add_argument('--input-format', choices=['csv', 'jsonl'], help='default from the extension')
+	parser.add_argument('-b', '--symbology', default='QRCODE', help='name or number, default QRCODE')
+	parser.add_argument('-s', '--set', action='append', default=[], metavar='FIELD=VALUE', help='zint_symbol field for every row')
+	parser.add_argument('-r', '--rotate', type=int, default=0, choices=[0, 90, 180, 270])
+	parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+	parser.add_argument('--processes', action='store_true', help='use processes instead of threads')
+	parser.add_argument('--chunksize', type=int, default=32)
+	parser.add_argument('--checkpoint', help='file recording progress, resumed from if present')
+	parser.add_argument('--checkpoint-every', type=int, default=1000, metavar='ROWS')
+	args = parser.parse_args(argv)
+
+	kind = args.input_format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+	output, extract = _formats[args.format]
+	try:
+		template = {'symbology': _symbology(args.symbology)}
+		for setting in args.set:
+			name, _, value = setting.partition('=')
+			template[name] = _option(name, value)
+	except ValueError as e:
+		parser.error(str(e))
+	source = os.path.abspath(args.input) if args.input != '-' else '-'
+	if args.checkpoint and (args.input == '-' or args.output == '-'):
+		parser.error('--checkpoint needs an input file and an output path')
+	skip = _load_checkpoint(args.checkpoint, source) if args.checkpoint else 0
+
+	if args.input == '-':
+		f = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+	else:
+		f = open(args.input, encoding='utf-8', newline='')
+	out = _output(args.output, skip > 0)
+	names = deque()
+	rows = islice(enumerate(_rows(f, kind)), skip, None)
+	done = skip
+	ok = errors = 0
+	start = time.perf_counter()
+	try:
+		results = encode_parallel(
+			_items(rows, names, '.' + args.format), template, output,
+			args.rotate, extract, args.workers, args.processes, args.chunksize
+		)
+		# Rows that failed in _items() are queued ahead of the next result,
+		# and after the last one
+		for result in chain(results, [None]):
+			while names:
+				n, name, error = names.popleft()
+				if error is None and result.ret >= ZINT_ERROR_TOO_LONG:
+					error = result.errtxt.decode('utf-8', 'replace')
+				if error is not None:
+					errors += 1
+					sys.stderr.write('row %d: %s\n' % (n, error))
+				else:
+					ok += 1
+					out.write(name, result.value)
+				done = n + 1
+				if args.checkpoint and done % args.checkpoint_every == 0:
+					out.flush()
+					_save_checkpoint(args.checkpoint, source, done)
+				if name is not None:
+					break
+	finally:
+		out.close()
+		f.close()
+		if args.checkpoint:
+			_save_checkpoint(args.checkpoint, source, done)
+	elapsed = time.perf_counter() - start
+	sys.stderr.write('%d encoded, %d failed, %d skipped in %.2fs (%.0f/s)\n' % (
+		ok, errors, skip, elapsed, (ok + errors) / elapsed if elapsed else 0))
+	return 1 if errors else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
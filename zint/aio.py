@@ -0,0 +1,113 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+from .parallel import _ThreadWorkers, _default_extract
+from .zint import _as_template
+
+# Runs encodes on a dedicated thread pool so the event loop keeps running
+# while libzint works (ctypes releases the GIL around foreign calls).  Each
+# worker thread reuses its own symbol.  At most limit encodes are queued
+# or running; further callers wait in encode() before anything is
+# submitted.  Cancelling a caller whose encode has not started yet removes
+# it from the queue; one whose encode is already running in a worker keeps
+# its slot until that encode finishes.  The limit is kept with a thread lock rather than an
+# asyncio.Semaphore, which binds to the first loop that waits on it, so
+# one encoder (like the default one) serves any number of loops, in turn
+# or at once.
+class AsyncEncoder(object):
+	def __init__ (self, template=None, output='buffer', rotate_angle=0,
+			extract=None, workers=None, limit=None):
+		if extract is None:
+			if output not in _default_extract:
+				raise ValueError('extract is required for output %r' % output)
+			extract = _default_extract[output]
+		if workers is None:
+			workers = min(4, os.cpu_count() or 1)
+		if limit is None:
+			limit = workers * 4
+		self.limit = limit
+		self._workers = _ThreadWorkers(
+			_as_template(template), output, rotate_angle, extract
+		)
+		self._executor = ThreadPoolExecutor(workers, thread_name_prefix='zint')
+		self._active = 0
+		self._waiters = deque()
+		self._lock = threading.Lock()
+
+	async def __aenter__ (self):
+		return self
+
+	async def __aexit__ (self, *exc):
+		self.close()
+
+	async def _acquire (self):
+		with self._lock:
+			if self._active < self.limit:
+				self._active += 1
+				return
+			loop = asyncio.get_running_loop()
+			waiter = loop.create_future()
+			self._waiters.append((loop, waiter))
+		try:
+			await waiter
+		except asyncio.CancelledError:
+			# Granted just as it was cancelled: pass the slot on
+			if waiter.done() and not waiter.cancelled():
+				self._release()
+			raise
+
+	def _release (self):
+		# Hands the slot straight to the next waiter, on its own loop.  A
+		# waiter cancelled meanwhile passes it on again from _grant().
+		with self._lock:
+			while self._waiters:
+				loop, waiter = self._waiters.popleft()
+				try:
+					loop.call_soon_threadsafe(self._grant, waiter)
+					return
+				except RuntimeError:
+					# Its loop is closed
+					pass
+			self._active -= 1
+
+	def _grant (self, waiter):
+		if waiter.done():
+			self._release()
+		else:
+			waiter.set_result(None)
+
+	# options override template fields for this payload only
+	async def encode (self, data, options=None):
+		await self._acquire()
+		try:
+			item = (data, options) if options else data
+			future = self._executor.submit(self._workers.run, [item])
+		except BaseException:
+			self._release()
+			raise
+		future.add_done_callback(lambda f: self._release())
+		return (await asyncio.wrap_future(future))[0]
+
+	def close (self):
+		self._executor.shutdown(wait=True)
+		self._workers.close()
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_encoder ():
+	global _default
+	with _default_lock:
+		if _default is None:
+			_default = AsyncEncoder()
+		return _default
+
+# await aencode(b'...', {'symbology': BARCODE_QRCODE}) on the shared
+# default encoder; value is (bitmap_width, bitmap_height, rgb)
+async def aencode (data, options=None, encoder=None):
+	if encoder is None:
+		encoder = default_encoder()
+	return await encoder.encode(data, options)
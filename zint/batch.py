@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+from . import zint as _zint
+from .zint import (
+	ZBarcode_Clear, ZBarcode_Create, ZBarcode_Delete, ZBarcode_Encode,
+	ZBarcode_Encode_and_Buffer, ZINT_ERROR_TOO_LONG, _as_template,
+	_check_symbol, _input_buffer, _symbol_input_fields
+)
+
+EncodeResult = namedtuple('EncodeResult', ['ret', 'errtxt', 'value'])
+
+# Encode every item of inputs with one symbol configured from template, a
+# dict of zint_symbol options or a SymbolTemplate to reuse across batches.  An
+# item is either the payload bytes or a (payload, options) pair whose
+# options override template fields for that item only.  The template is
+# stamped back before every item, since libzint writes some input fields
+# (height, and for some symbologies border_width or option_2) back into the
+# symbol.  value is extract(symbol) when extract is given, otherwise the
+# symbol itself, which is overwritten by the next item.
+def encode_many (inputs, template=None, output='buffer', rotate_angle=0,
+		extract=None, symbol=None):
+	template = _as_template(template)
+	owned = symbol is None
+	if owned:
+		symbol = ZBarcode_Create()
+		if not symbol:
+			raise MemoryError('ZBarcode_Create() failed')
+	try:
+		for result in _encode_items(symbol, template, inputs, output,
+				rotate_angle, extract):
+			yield result
+	finally:
+		if owned:
+			ZBarcode_Delete(symbol)
+
+def _encode_items (symbol, template, inputs, output, rotate_angle, extract):
+	if output == 'buffer':
+		encode = ZBarcode_Encode_and_Buffer
+	elif output == 'vector' and hasattr(_zint, 'ZBarcode_Encode_and_Buffer_Vector'):
+		encode = _zint.ZBarcode_Encode_and_Buffer_Vector
+	elif output != 'encode':
+		raise ValueError('unsupported output %r' % output)
+	_check_symbol(symbol)
+	contents = symbol.contents
+	for item in inputs:
+		if isinstance(item, tuple):
+			data, options = item
+		else:
+			data, options = item, None
+		ZBarcode_Clear(symbol)
+		template.stamp(symbol)
+		if options:
+			for name, value in options.items():
+				if name not in _symbol_input_fields:
+					raise AttributeError('zint_symbol has no input field %r' % name)
+				setattr(contents, name, value)
+		source, length = _input_buffer(data)
+		if output == 'encode':
+			ret = ZBarcode_Encode(symbol, source, length)
+		else:
+			ret = encode(symbol, source, length, rotate_angle)
+		if ret == 0:
+			errtxt = b''
+		else:
+			errtxt = contents.errtxt
+		if ret >= ZINT_ERROR_TOO_LONG:
+			value = None
+		elif extract is not None:
+			value = extract(symbol)
+		else:
+			value = symbol
+		yield EncodeResult(ret, errtxt, value)
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from ctypes import Structure
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+
+from .zint import (
+	ZBarcode_Clear, ZBarcode_Encode_and_Buffer, ZBarcode_Encode_and_Print,
+	ZBarcode_Version, ZINT_ERROR_TOO_LONG, _check_symbol, _input_buffer,
+	_symbol_input_fields, _symbol_input_runs
+)
+from .batch import EncodeResult
+from .parallel import bitmap_copy
+
+# Cache key over every input field of symbol, the payload and the kind of
+# output.  Only the extension of outfile matters since it picks the file
+# format.
+def symbol_key (symbol, data, output, rotate_angle=0):
+	_check_symbol(symbol)
+	c = symbol.contents
+	h = hashlib.sha256()
+	h.update(('%d:%s:%d' % (ZBarcode_Version(), output, rotate_angle)).encode('ascii'))
+	for name in _symbol_input_fields:
+		value = getattr(c, name)
+		if name == 'outfile':
+			value = os.path.splitext(value)[1].lower()
+		elif isinstance(value, Structure):
+			value = bytes(value)
+		h.update(('%s=%r;' % (name, value)).encode('ascii'))
+	h.update(struct.pack('<Q', len(data)))
+	h.update(data)
+	return h.hexdigest()
+
+class MemoryCache(object):
+	# LRU bounded by both entry count and total value size
+	def __init__ (self, maxsize=1024, maxbytes=64 << 20):
+		self.maxsize = maxsize
+		self.maxbytes = maxbytes
+		self.nbytes = 0
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__ (self):
+		return len(self._data)
+
+	def get (self, key):
+		with self._lock:
+			value = self._data.get(key)
+			if value is not None:
+				self._data.move_to_end(key)
+			return value
+
+	def set (self, key, value):
+		if len(value) > self.maxbytes:
+			return
+		with self._lock:
+			old = self._data.pop(key, None)
+			if old is not None:
+				self.nbytes -= len(old)
+			self._data[key] = value
+			self.nbytes += len(value)
+			while len(self._data) > self.maxsize or self.nbytes > self.maxbytes:
+				self.nbytes -= len(self._data.popitem(last=False)[1])
+
+	def clear (self):
+		with self._lock:
+			self._data.clear()
+			self.nbytes = 0
+
+class DirectoryCache(object):
+	# One file per key, fanned out over 256 subdirectories.  Writes go
+	# through a temporary file and os.replace() so concurrent readers never
+	# see a partial entry.
+	def __init__ (self, path):
+		self.path = path
+
+	def _path (self, key):
+		return os.path.join(self.path, key[:2], key)
+
+	def get (self, key):
+		try:
+			with open(self._path(key), 'rb') as f:
+				return f.read()
+		except (IOError, OSError):
+			return None
+
+	def set (self, key, value):
+		path = self._path(key)
+		d = os.path.dirname(path)
+		if not os.path.isdir(d):
+			os.makedirs(d, exist_ok=True)
+		fd, tmp = tempfile.mkstemp(dir=d)
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				f.write(value)
+			os.replace(tmp, path)
+		except BaseException:
+			os.unlink(tmp)
+			raise
+
+def _encode (func, symbol, data, rotate_angle):
+	# libzint writes some input fields back into the symbol (a default
+	# height, border_width and output_options for stacked symbols, option_2
+	# for MicroPDF417), which would change the key of the next identical
+	# request, so every input field is put back afterwards
+	view = memoryview(symbol.contents).cast('B')
+	saved = [(start, end, bytes(view[start:end])) for start, end in _symbol_input_runs]
+	ZBarcode_Clear(symbol)
+	source, length = _input_buffer(data)
+	ret = func(symbol, source, length, rotate_angle)
+	for start, end, image in saved:
+		view[start:end] = image
+	return ret
+
+class RenderCache(object):
+	# Serves repeat renders from backend instead of encoding again.  Only
+	# results without errors or warnings are stored.
+	def __init__ (self, backend=None):
+		if backend is None:
+			backend = MemoryCache()
+		self.backend = backend
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+
+	def _lookup (self, key):
+		value = self.backend.get(key)
+		with self._lock:
+			if value is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+		return value
+
+	# Like ZBarcode_Encode_and_Buffer(); value is (width, height, rgb)
+	def buffer (self, symbol, data, rotate_angle=0):
+		key = symbol_key(symbol, data, 'buffer', rotate_angle)
+		value = self._lookup(key)
+		if value is not None:
+			width, height = struct.unpack_from('<ii', value)
+			return EncodeResult(0, b'', (width, height, value[8:]))
+		ret = _encode(ZBarcode_Encode_and_Buffer, symbol, data, rotate_angle)
+		if ret >= ZINT_ERROR_TOO_LONG:
+			return EncodeResult(ret, symbol.contents.errtxt, None)
+		width, height, rgb = bitmap_copy(symbol)
+		if ret != 0:
+			return EncodeResult(ret, symbol.contents.errtxt, (width, height, rgb))
+		self.backend.set(key, struct.pack('<ii', width, height) + rgb)
+		return EncodeResult(0, b'', (width, height, rgb))
+
+	# Like ZBarcode_Encode_and_Print(); outfile is written either way and
+	# value is its contents
+	def print (self, symbol, data, rotate_angle=0):
+		key = symbol_key(symbol, data, 'print', rotate_angle)
+		value = self._lookup(key)
+		outfile = symbol.contents.outfile
+		if value is not None:
+			with open(outfile, 'wb') as f:
+				f.write(value)
+			return EncodeResult(0, b'', value)
+		ret = _encode(ZBarcode_Encode_and_Print, symbol, data, rotate_angle)
+		if ret >= ZINT_ERROR_TOO_LONG:
+			return EncodeResult(ret, symbol.contents.errtxt, None)
+		with open(outfile, 'rb') as f:
+			value = f.read()
+		if ret != 0:
+			return EncodeResult(ret, symbol.contents.errtxt, value)
+		self.backend.set(key, value)
+		return EncodeResult(0, b'', value)
+
+	def stats (self):
+		with self._lock:
+			total = self.hits + self.misses
+			return {
+				'hits': self.hits, 'misses': self.misses,
+				'hit_rate': float(self.hits) / total if total else 0.0
+			}
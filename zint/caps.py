@@ -0,0 +1,237 @@
+from collections import namedtuple
+from ctypes import CDLL, POINTER, Structure, byref, c_char, c_char_p, c_void_p, cast
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+
+from . import zint as _zint
+from .zint import ZBarcode_ValidID, ZBarcode_Version
+
+# Everything worth knowing about one symbology, gathered once per libzint
+# version.  constants holds every BARCODE_* alias of id, caps the full
+# ZBarcode_Cap() bitmask (0 before 2.10), default_xdim is in mm (None
+# before 2.12) and options maps option_1/2/3 to the (min, max) range
+# libzint accepts when set.  automatic maps each of option_1/2/3 to the
+# values that leave the choice to libzint: what ZBarcode_Create() sets
+# (-1 for option_1, 0 for the others), so an explicit 0, e.g. PDF417
+# security level 0, is checked like any other value.
+Symbology = namedtuple('Symbology', ['id', 'constants', 'name', 'caps', 'default_xdim', 'options', 'automatic'])
+
+# BARCODE_* names that are output_options flags rather than symbologies
+_flags = frozenset([
+	'BARCODE_NO_ASCII', 'BARCODE_BIND_TOP', 'BARCODE_BIND', 'BARCODE_BOX',
+	'BARCODE_STDOUT', 'BARCODE_DOTTY_MODE', 'BARCODE_QUIET_ZONES',
+	'BARCODE_NO_QUIET_ZONES', 'BARCODE_LAST'
+])
+
+# From the range checks in the libzint backend; libzint has no API for these
+_pdf417 = {'option_1': (0, 8), 'option_2': (1, 30), 'option_3': (3, 90)}
+_options = {
+	'BARCODE_AZTEC': {'option_1': (1, 4), 'option_2': (1, 36)},
+	'BARCODE_HIBC_AZTEC': {'option_1': (1, 4), 'option_2': (1, 36)},
+	'BARCODE_QRCODE': {'option_1': (1, 4), 'option_2': (1, 40)},
+	'BARCODE_HIBC_QR': {'option_1': (1, 4), 'option_2': (1, 40)},
+	'BARCODE_MICROQR': {'option_1': (1, 4), 'option_2': (1, 4)},
+	'BARCODE_RMQR': {'option_2': (1, 38)},
+	'BARCODE_DATAMATRIX': {'option_2': (1, 48)},
+	'BARCODE_HIBC_DM': {'option_2': (1, 48)},
+	'BARCODE_PDF417': _pdf417,
+	'BARCODE_PDF417TRUNC': _pdf417,
+	'BARCODE_HIBC_PDF': _pdf417,
+	'BARCODE_MICROPDF417': {'option_2': (1, 4)},
+	'BARCODE_HIBC_MICPDF': {'option_2': (1, 4)},
+	'BARCODE_HANXIN': {'option_1': (1, 4), 'option_2': (1, 84)},
+	'BARCODE_GRIDMATRIX': {'option_1': (1, 5), 'option_2': (1, 13)},
+	'BARCODE_CODEONE': {'option_2': (1, 10)},
+	'BARCODE_ULTRA': {'option_1': (1, 6), 'option_2': (1, 2)},
+	'BARCODE_MAXICODE': {'option_1': (2, 6)},
+	'BARCODE_CODE16K': {'option_1': (2, 16)},
+	'BARCODE_CODE49': {'option_1': (2, 8)},
+	'BARCODE_CODABLOCKF': {'option_2': (9, 67)},
+	'BARCODE_HIBC_BLOCKF': {'option_2': (9, 67)},
+	'BARCODE_RSS_EXPSTACK': {'option_2': (1, 11)}
+}
+
+# Automatic values on top of the defaults, from the same backend code
+_automatic = {
+	# 0 picks mode 2 or 3 from the primary message
+	'BARCODE_MAXICODE': {'option_1': (0,)}
+}
+
+def _defaults ():
+	# option_1/2/3 of a freshly created symbol
+	symbol = _zint.ZBarcode_Create()
+	if not symbol:
+		raise MemoryError('ZBarcode_Create() failed')
+	try:
+		c = symbol.contents
+		return {'option_1': c.option_1, 'option_2': c.option_2, 'option_3': c.option_3}
+	finally:
+		_zint.ZBarcode_Delete(symbol)
+
+def _probe ():
+	defaults = _defaults()
+	ids = {}
+	for name in _zint.__all__:
+		if not name.startswith('BARCODE_') or name in _flags:
+			continue
+		value = getattr(_zint, name)
+		if ZBarcode_ValidID(value):
+			ids.setdefault(value, []).append(name)
+	entries = []
+	for id in sorted(ids):
+		constants = tuple(sorted(ids[id]))
+		name = constants[0][8:]
+		if hasattr(_zint, 'ZBarcode_BarcodeName'):
+			buf = (c_char * 32)()
+			if _zint.ZBarcode_BarcodeName(id, buf) == 0:
+				name = buf.value.decode('ascii')[8:]
+		caps = 0
+		if hasattr(_zint, 'ZBarcode_Cap'):
+			caps = _zint.ZBarcode_Cap(id, 0xffffffff)
+		xdim = None
+		if hasattr(_zint, 'ZBarcode_Default_Xdim'):
+			xdim = _zint.ZBarcode_Default_Xdim(id)
+		options = {}
+		automatic = dict((k, (v,)) for k, v in defaults.items())
+		for constant in constants:
+			options.update(_options.get(constant, {}))
+			for option, values in _automatic.get(constant, {}).items():
+				automatic[option] += values
+		entries.append((id, constants, name, caps, xdim, options, automatic))
+	return entries
+
+class _Dl_info(Structure):
+	_fields_ = [
+		('dli_fname', c_char_p),
+		('dli_fbase', c_void_p),
+		('dli_sname', c_char_p),
+		('dli_saddr', c_void_p)
+	]
+
+# Path of the libzint actually loaded; LoadLibrary() only records the name
+# it was given
+def _library_path ():
+	try:
+		info = _Dl_info()
+		dladdr = CDLL(None).dladdr
+		dladdr.argtypes = [c_void_p, POINTER(_Dl_info)]
+		if dladdr(cast(_zint._lib.ZBarcode_ValidID, c_void_p), byref(info)):
+			return os.path.realpath(os.fsdecode(info.dli_fname))
+	except (AttributeError, OSError, TypeError):
+		pass
+	return _zint._lib._name
+
+def _cache_key ():
+	path = _library_path()
+	try:
+		st = os.stat(path)
+		stamp = (st.st_size, st.st_mtime_ns)
+	except OSError:
+		stamp = (0, 0)
+	return (3, path, stamp[0], stamp[1], ZBarcode_Version(), marshal.version)
+
+def _cache_dir ():
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	return os.path.join(base, 'python-zint')
+
+class Registry(object):
+	# Lookups by symbology id or BARCODE_* constant name
+	def __init__ (self, version, entries):
+		self.version = version
+		self._by_id = {}
+		self._by_name = {}
+		for entry in entries:
+			symbology = Symbology(*entry)
+			self._by_id[symbology.id] = symbology
+			for constant in symbology.constants:
+				self._by_name[constant] = symbology
+
+	def __len__ (self):
+		return len(self._by_id)
+
+	def __iter__ (self):
+		return iter(self._by_id.values())
+
+	def __contains__ (self, key):
+		return key in self._by_id or key in self._by_name
+
+	def __getitem__ (self, key):
+		if isinstance(key, str):
+			return self._by_name[key]
+		return self._by_id[key]
+
+	def get (self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def valid (self, id):
+		return id in self._by_id
+
+	def cap (self, id, flag):
+		return self._by_id[id].caps & flag
+
+	# Raises ValueError if an option set to anything but automatic is out of
+	# range; None means not given
+	def check_options (self, id, option_1=None, option_2=None, option_3=None):
+		symbology = self._by_id[id]
+		ranges = symbology.options
+		for name, value in (('option_1', option_1), ('option_2', option_2), ('option_3', option_3)):
+			if value is None or value in symbology.automatic[name]:
+				continue
+			if name in ranges:
+				low, high = ranges[name]
+				if not low <= value <= high:
+					raise ValueError('%s %d out of range %d..%d for %s' % (
+						name, value, low, high, symbology.name))
+
+# Loads the table from cache_dir if it was written for this exact libzint
+# (path, size, mtime and version), otherwise probes the library and saves
+# it there.  A read-only or missing cache directory only costs the probe.
+def load_registry (cache_dir=None, refresh=False):
+	if cache_dir is None:
+		cache_dir = _cache_dir()
+	key = _cache_key()
+	path = os.path.join(
+		cache_dir,
+		'caps-%s.marshal' % hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+	)
+	if not refresh:
+		try:
+			with open(path, 'rb') as f:
+				stored, entries = marshal.loads(f.read())
+			if stored == key:
+				return Registry(key[4], entries)
+		except (OSError, EOFError, ValueError, TypeError):
+			pass
+	entries = _probe()
+	try:
+		os.makedirs(cache_dir, exist_ok=True)
+		fd, tmp = tempfile.mkstemp(dir=cache_dir)
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				f.write(marshal.dumps((key, entries)))
+			os.replace(tmp, path)
+		except BaseException:
+			os.unlink(tmp)
+			raise
+	except OSError:
+		pass
+	return Registry(key[4], entries)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+# The process wide Registry, loaded on first use
+def registry ():
+	global _registry
+	if _registry is not None:
+		return _registry
+	with _registry_lock:
+		if _registry is None:
+			_registry = load_registry()
+		return _registry
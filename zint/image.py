@@ -0,0 +1,151 @@
+import io
+import struct
+import zlib
+
+from . import zint as _zint
+from .zint import (
+	ZBarcode_Clear, ZINT_ERROR_TOO_LONG, _check_symbol, _input_buffer,
+	bitmapview
+)
+from .batch import EncodeResult
+from .vector import (
+	_colour, _hexagon, _num, _rect_colours, vectorarrays, write_pdf,
+	write_svg
+)
+
+# Everything here builds the image in memory from the symbol's bitmap or
+# vector, so unlike ZBarcode_Print() nothing is written to outfile.
+
+def _chunk (kind, data):
+	return (
+		struct.pack('>I', len(data)) + kind + data +
+		struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+	)
+
+def pngbytes (symbol, level=6):
+	_check_symbol(symbol)
+	c = symbol.contents
+	width, height = c.bitmap_width, c.bitmap_height
+	rgb = bitmapview(symbol)
+	alpha = None
+	if hasattr(_zint, 'alphamapview'):
+		alpha = _zint.alphamapview(symbol)
+	if alpha is None:
+		colour_type, stride = 2, width * 3
+		rows = [rgb[y * stride:(y + 1) * stride] for y in range(height)]
+	else:
+		# Interleave the alphamap into RGBA a row at a time
+		colour_type, stride = 6, width * 4
+		rows = []
+		for y in range(height):
+			row = bytearray(stride)
+			row[0::4] = rgb[y * width * 3:(y + 1) * width * 3:3]
+			row[1::4] = rgb[y * width * 3 + 1:(y + 1) * width * 3:3]
+			row[2::4] = rgb[y * width * 3 + 2:(y + 1) * width * 3:3]
+			row[3::4] = alpha[y * width:(y + 1) * width]
+			rows.append(row)
+	raw = b'\x00' + b'\x00'.join(rows)
+	png = [
+		b'\x89PNG\r\n\x1a\n',
+		_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colour_type, 0, 0, 0))
+	]
+	dpmm = getattr(c, 'dpmm', 0)
+	if dpmm:
+		ppm = int(round(dpmm * 1000))
+		png.append(_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+	png.append(_chunk(b'IDAT', zlib.compress(raw, level)))
+	png.append(_chunk(b'IEND', b''))
+	return b''.join(png)
+
+def svgbytes (symbol, merge=True):
+	f = io.BytesIO()
+	write_svg(symbol, f, merge)
+	return f.getvalue()
+
+def pdfbytes (symbol, merge=True):
+	f = io.BytesIO()
+	write_pdf(symbol, f, merge)
+	return f.getvalue()
+
+def epsbytes (symbol):
+	c = symbol.contents
+	arrays = vectorarrays(symbol)
+	height = arrays.height
+
+	def rgb (hexcolour):
+		return ' '.join(
+			'%.2f' % (int(hexcolour[i:i + 2], 16) / 255.0) for i in (0, 2, 4)
+		)
+
+	fg = _colour(c.fgcolour)[0]
+	bg = _colour(c.bgcolour)[0]
+	out = [
+		'%!PS-Adobe-3.0 EPSF-3.0\n',
+		'%%Creator: Zint\n',
+		'%%%%BoundingBox: 0 0 %d %d\n' % (
+			int(round(arrays.width)), int(round(height))),
+		'%%EndComments\n',
+		'/TR { newpath 4 1 roll moveto 1 index 0 rlineto 0 exch rlineto neg 0 rlineto closepath fill } bind def\n',
+		'%s setrgbcolor\n' % rgb(bg),
+		'%s 0 0 %s TR\n' % (_num(height), _num(arrays.width)),
+		'%s setrgbcolor\n' % rgb(fg)
+	]
+	# PostScript's origin is bottom left, zint's top left
+	colour = fg
+	r = arrays.rectangles
+	for x, y, w, h, rc in zip(r['x'], r['y'], r['width'], r['height'], r['colour']):
+		want = fg if rc == -1 else _rect_colours.get(rc, fg)
+		if want != colour:
+			out.append('%s setrgbcolor\n' % rgb(want))
+			colour = want
+		out.append('%s %s %s %s TR\n' % (_num(h), _num(x), _num(height - y - h), _num(w)))
+	if colour != fg:
+		out.append('%s setrgbcolor\n' % rgb(fg))
+	hx = arrays.hexagons
+	for x, y, diameter, rotation in zip(hx['x'], hx['y'], hx['diameter'], hx['rotation']):
+		points = _hexagon(x, y, diameter, rotation)
+		out.append('newpath %s %s moveto %s closepath fill\n' % (
+			_num(points[0][0]), _num(height - points[0][1]),
+			' '.join('%s %s lineto' % (_num(px), _num(height - py)) for px, py in points[1:])))
+	ci = arrays.circles
+	for x, y, diameter, width, colour in zip(ci['x'], ci['y'], ci['diameter'], ci['width'], ci['colour']):
+		out.append('%s setrgbcolor\n' % rgb(colour and bg or fg))
+		if width:
+			out.append('newpath %s %s %s 0 360 arc %s setlinewidth stroke\n' % (
+				_num(x), _num(height - y), _num(diameter / 2.0), _num(width)))
+		else:
+			out.append('newpath %s %s %s 0 360 arc fill\n' % (
+				_num(x), _num(height - y), _num(diameter / 2.0)))
+	out.append('%s setrgbcolor\n' % rgb(fg))
+	st = arrays.strings
+	for x, y, fsize, rotation, halign, text in zip(
+			st['x'], st['y'], st['fsize'], st['rotation'], st['halign'], st['text']):
+		text = text.encode('latin-1', 'replace').decode('latin-1')
+		text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+		offset = {1: '0', 2: 'dup stringwidth pop neg'}.get(halign, 'dup stringwidth pop 2 div neg')
+		out.append('/Helvetica findfont %s scalefont setfont\n' % _num(fsize))
+		out.append('gsave %s %s translate %s rotate (%s) %s 0 moveto show grestore\n' % (
+			_num(x), _num(height - y), -rotation, text, offset))
+	out.append('showpage\n%%EOF\n')
+	return ''.join(out).encode('latin-1')
+
+# Bindings by name so that zint.metrics can swap them
+_formats = {'png': ('ZBarcode_Encode_and_Buffer', pngbytes)}
+if hasattr(_zint, 'ZBarcode_Encode_and_Buffer_Vector'):
+	_formats['svg'] = ('ZBarcode_Encode_and_Buffer_Vector', svgbytes)
+	_formats['eps'] = ('ZBarcode_Encode_and_Buffer_Vector', epsbytes)
+	_formats['pdf'] = ('ZBarcode_Encode_and_Buffer_Vector', pdfbytes)
+
+# Encode data and return the image as EncodeResult(ret, errtxt, bytes)
+def encode_bytes (symbol, data, format='png', rotate_angle=0):
+	try:
+		encode, serialize = _formats[format]
+	except KeyError:
+		raise ValueError('unsupported format %r' % format)
+	ZBarcode_Clear(symbol)
+	source, length = _input_buffer(data)
+	ret = getattr(_zint, encode)(symbol, source, length, rotate_angle)
+	if ret >= ZINT_ERROR_TOO_LONG:
+		return EncodeResult(ret, symbol.contents.errtxt, None)
+	errtxt = ret and symbol.contents.errtxt or b''
+	return EncodeResult(ret, errtxt, serialize(symbol))
@@ -0,0 +1,64 @@
+from collections import namedtuple
+from ctypes import addressof, string_at
+
+from .zint import ZINT_COLS_MAX, _check_symbol, zint_symbol
+
+# rows x width module grid read from encoded_data.  data is either bytes
+# holding each row packed MSB first and padded to a whole byte (the layout
+# of PBM P4 rasters) or a NumPy boolean array.
+ModuleMatrix = namedtuple('ModuleMatrix', ['rows', 'width', 'data', 'row_height'])
+
+# libzint packs 8 modules per encoded_data byte since ZINT_COLS_MAX became
+# 144, and 7 per byte before that.  Both are least significant bit first.
+if ZINT_COLS_MAX == 144:
+	_modules_per_byte = 8
+	_bit_reverse = bytes(int('{:08b}'.format(i)[::-1], 2) for i in range(256))
+else:
+	_modules_per_byte = 7
+	_bits7 = tuple('{:07b}'.format(i & 0x7f)[::-1] for i in range(256))
+
+def _encoded_rows (z):
+	_check_symbol(z)
+	c = z.contents
+	if c.rows <= 0:
+		raise ValueError('symbol has not been encoded')
+	raw = string_at(
+		addressof(c) + zint_symbol.encoded_data.offset,
+		c.rows * ZINT_COLS_MAX
+	)
+	return c, raw
+
+def modulematrix (z):
+	c, raw = _encoded_rows(z)
+	rows, width = c.rows, c.width
+	stride = (width + 7) // 8
+	if _modules_per_byte == 8:
+		raw = raw.translate(_bit_reverse)
+		data = bytearray(b''.join(
+			raw[r * ZINT_COLS_MAX:r * ZINT_COLS_MAX + stride]
+			for r in range(rows)
+		))
+		if width % 8:
+			mask = (0xff00 >> (width % 8)) & 0xff
+			for r in range(stride - 1, len(data), stride):
+				data[r] &= mask
+	else:
+		used = (width + 6) // 7
+		data = bytearray()
+		for r in range(rows):
+			row = raw[r * ZINT_COLS_MAX:r * ZINT_COLS_MAX + used]
+			bits = ''.join([_bits7[b] for b in row])[:width]
+			data += int(bits.ljust(stride * 8, '0'), 2).to_bytes(stride, 'big')
+	return ModuleMatrix(rows, width, bytes(data), c.row_height[:rows])
+
+def modulearray (z):
+	import numpy
+	c, raw = _encoded_rows(z)
+	rows, width = c.rows, c.width
+	bits = numpy.unpackbits(
+		numpy.frombuffer(raw, dtype=numpy.uint8).reshape(rows, ZINT_COLS_MAX),
+		axis=1, bitorder='little'
+	)
+	if _modules_per_byte == 7:
+		bits = bits.reshape(rows, ZINT_COLS_MAX, 8)[:, :, :7].reshape(rows, -1)
+	return ModuleMatrix(rows, width, bits[:, :width].astype(bool), c.row_height[:rows])
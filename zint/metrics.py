@@ -0,0 +1,164 @@
+from collections import namedtuple
+from ctypes import POINTER, c_int
+import os
+import sys
+import threading
+import time
+
+from . import zint as _zint
+
+# One ZBarcode_* call.  symbology is None for calls without a symbol, ret
+# None for calls that don't return a status and nbytes is what the call
+# produced: the RGB bitmap for buffer calls, the file for print calls.
+CallEvent = namedtuple('CallEvent', ['function', 'symbology', 'output', 'ret', 'seconds', 'nbytes'])
+
+def _output (name):
+	if 'Vector' in name:
+		return 'vector'
+	if 'Print' in name:
+		return 'print'
+	if 'Buffer' in name:
+		return 'buffer'
+	if 'Encode' in name:
+		return 'encode'
+	return 'other'
+
+def _produced (symbol, output):
+	c = symbol.contents
+	if output == 'buffer':
+		return c.bitmap_width * c.bitmap_height * 3
+	if output == 'print':
+		try:
+			return os.path.getsize(c.outfile)
+		except (OSError, ValueError):
+			return 0
+	return 0
+
+def _wrap (name, func, callback):
+	output = _output(name)
+	# func may itself be a wrapper, e.g. from zint.threads' debug mode
+	binding = getattr(func, '__wrapped__', func)
+	argtypes = getattr(binding, 'argtypes', None) or []
+	if not argtypes or argtypes[0] is not POINTER(_zint.zint_symbol):
+		def wrapper (*args):
+			start = time.perf_counter()
+			result = func(*args)
+			callback(CallEvent(name, None, output, None, time.perf_counter() - start, 0))
+			return result
+	elif getattr(binding, 'restype', None) is c_int:
+		def wrapper (symbol, *args):
+			symbology = symbol.contents.symbology
+			start = time.perf_counter()
+			ret = func(symbol, *args)
+			elapsed = time.perf_counter() - start
+			nbytes = _produced(symbol, output) if ret < _zint.ZINT_ERROR_TOO_LONG else 0
+			callback(CallEvent(name, symbology, output, ret, elapsed, nbytes))
+			return ret
+	else:
+		def wrapper (symbol, *args):
+			symbology = symbol.contents.symbology if symbol else None
+			start = time.perf_counter()
+			result = func(symbol, *args)
+			callback(CallEvent(name, symbology, output, None, time.perf_counter() - start, 0))
+			return result
+	wrapper.__name__ = name
+	wrapper.__wrapped__ = func
+	return wrapper
+
+_lock = threading.Lock()
+_originals = {}
+
+def _modules ():
+	for name, module in list(sys.modules.items()):
+		if module is not None and (name == 'zint' or name.startswith('zint.')):
+			yield module
+
+def _swap (mapping):
+	# Rebinds every module level reference to the old functions, including
+	# the names modules imported with "from .zint import ..."
+	for module in _modules():
+		namespace = vars(module)
+		for name, value in list(namespace.items()):
+			if name in mapping and namespace[name] is mapping[name][0]:
+				namespace[name] = mapping[name][1]
+
+# Replaces every ZBarcode_* binding with a wrapper passing a CallEvent to
+# callback after each call.  Disabled, the plain ctypes functions are in
+# place and cost nothing extra.  Code holding its own reference to a
+# binding (from zint import ZBarcode_Encode before this was called) keeps
+# calling the original.
+def instrument (callback):
+	with _lock:
+		if _originals:
+			_swap(dict((n, (w, f)) for n, (f, w) in _originals.items()))
+			_originals.clear()
+		for name in _zint.__all__:
+			if name.startswith('ZBarcode_'):
+				func = getattr(_zint, name)
+				_originals[name] = (func, _wrap(name, func, callback))
+		_swap(_originals)
+	return callback
+
+def uninstrument ():
+	with _lock:
+		_swap(dict((n, (w, f)) for n, (f, w) in _originals.items()))
+		_originals.clear()
+
+def instrumented ():
+	return bool(_originals)
+
+class Metrics(object):
+	# Aggregating callback for instrument().  Latency histograms are kept
+	# per (function, symbology) with cumulative counts per upper bound in
+	# seconds, as Prometheus expects.
+	buckets = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, float('inf'))
+
+	def __init__ (self, export=None):
+		self.export = export
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset (self):
+		with self._lock:
+			self.calls = {}
+			self.seconds = {}
+			self.histograms = {}
+			self.codes = {}
+			self.nbytes = {}
+
+	def __call__ (self, event):
+		key = (event.function, event.symbology)
+		with self._lock:
+			self.calls[key] = self.calls.get(key, 0) + 1
+			self.seconds[key] = self.seconds.get(key, 0.0) + event.seconds
+			histogram = self.histograms.get(key)
+			if histogram is None:
+				histogram = self.histograms[key] = [0] * len(self.buckets)
+			for i, bound in enumerate(self.buckets):
+				if event.seconds <= bound:
+					histogram[i] += 1
+					break
+			if event.ret is not None:
+				code = (event.function, event.ret)
+				self.codes[code] = self.codes.get(code, 0) + 1
+			if event.nbytes:
+				output = event.output
+				self.nbytes[output] = self.nbytes.get(output, 0) + event.nbytes
+		if self.export is not None:
+			self.export(event)
+
+	def snapshot (self):
+		with self._lock:
+			histograms = {}
+			for key, counts in self.histograms.items():
+				total = 0
+				cumulative = []
+				for count in counts:
+					total += count
+					cumulative.append(total)
+				histograms[key] = list(zip(self.buckets, cumulative))
+			return {
+				'calls': dict(self.calls), 'seconds': dict(self.seconds),
+				'histograms': histograms, 'codes': dict(self.codes),
+				'bytes': dict(self.nbytes)
+			}
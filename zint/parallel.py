@@ -0,0 +1,122 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import os
+import threading
+
+from . import zint as _zint
+from .zint import ZBarcode_Create, ZBarcode_Delete, _as_template, bitmapview
+from .batch import _encode_items
+from .matrix import modulematrix
+
+# Default extract functions.  Results cross thread or process boundaries so
+# they must not alias a worker's symbol and must be picklable.
+def bitmap_copy (symbol):
+	c = symbol.contents
+	return c.bitmap_width, c.bitmap_height, bytes(bitmapview(symbol))
+
+_default_extract = {
+	'buffer': bitmap_copy,
+	'encode': modulematrix
+}
+if hasattr(_zint, 'zint_vector'):
+	from .vector import vectorarrays
+	_default_extract['vector'] = vectorarrays
+
+class _ThreadWorkers(object):
+	# A zint_symbol must never be used by two threads at once, so each
+	# worker thread lazily creates and keeps its own.
+	def __init__ (self, template, output, rotate_angle, extract):
+		self.template = template
+		self.args = (output, rotate_angle, extract)
+		self.symbols = []
+		self._local = threading.local()
+		self._lock = threading.Lock()
+
+	def run (self, chunk):
+		symbol = getattr(self._local, 'symbol', None)
+		if symbol is None:
+			symbol = ZBarcode_Create()
+			if not symbol:
+				raise MemoryError('ZBarcode_Create() failed')
+			with self._lock:
+				self.symbols.append(symbol)
+			self._local.symbol = symbol
+		return list(_encode_items(symbol, self.template, chunk, *self.args))
+
+	def close (self):
+		with self._lock:
+			symbols, self.symbols = self.symbols, []
+		for symbol in symbols:
+			ZBarcode_Delete(symbol)
+
+_process_state = None
+
+def _process_init (template, output, rotate_angle, extract):
+	global _process_state
+	symbol = ZBarcode_Create()
+	if not symbol:
+		raise MemoryError('ZBarcode_Create() failed')
+	# The symbol lives as long as the worker process
+	_process_state = (
+		symbol, _as_template(template), output, rotate_angle, extract
+	)
+
+def _process_run (chunk):
+	symbol, template, output, rotate_angle, extract = _process_state
+	return list(_encode_items(
+		symbol, template, chunk, output, rotate_angle, extract
+	))
+
+# Like encode_many() but spread over a pool of workers, each owning its own
+# symbol.  Inputs are consumed lazily in chunks of chunksize and at most
+# max_inflight chunks are queued or held at once; results are yielded in
+# input order.  With processes=True a process pool is used instead of
+# threads, in which case extract must be picklable.
+def encode_parallel (inputs, template=None, output='buffer', rotate_angle=0,
+		extract=None, workers=None, processes=False, chunksize=32,
+		max_inflight=None):
+	if extract is None:
+		if output not in _default_extract:
+			raise ValueError('extract is required for output %r' % output)
+		extract = _default_extract[output]
+	if workers is None:
+		workers = os.cpu_count() or 1
+	if max_inflight is None:
+		max_inflight = workers * 2
+	if processes:
+		# Importing this pulls in multiprocessing, so only do it when asked
+		from concurrent.futures import ProcessPoolExecutor
+		executor = ProcessPoolExecutor(
+			workers, initializer=_process_init,
+			initargs=(template, output, rotate_angle, extract)
+		)
+		run = _process_run
+		threads = None
+	else:
+		executor = ThreadPoolExecutor(workers)
+		threads = _ThreadWorkers(
+			_as_template(template), output, rotate_angle, extract
+		)
+		run = threads.run
+	pending = deque()
+	inputs = iter(inputs)
+	exhausted = False
+	try:
+		while True:
+			while not exhausted and len(pending) < max_inflight:
+				chunk = list(islice(inputs, chunksize))
+				if not chunk:
+					exhausted = True
+					break
+				pending.append(executor.submit(run, chunk))
+			if not pending:
+				break
+			for result in pending.popleft().result():
+				yield result
+	finally:
+		for future in pending:
+			future.cancel()
+		executor.shutdown(wait=True)
+		if threads is not None:
+			threads.close()
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+import threading
+import time
+
+from .zint import ZBarcode_Create, ZBarcode_Delete, _as_template, _claim
+
+# Idle symbols kept for reuse, each reset from template on the way in and
+# out.  Any thread may acquire and release; a symbol belongs to whoever
+# holds it in between.
+class SymbolPool(object):
+	def __init__ (self, template=None, maxsize=8, idle_timeout=None):
+		if maxsize < 0:
+			raise ValueError('maxsize must be >= 0')
+		self.maxsize = maxsize
+		self.idle_timeout = idle_timeout
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._template = _as_template(template)
+		self._idle = []
+		self._lock = threading.Lock()
+
+	def __enter__ (self):
+		return self
+
+	def __exit__ (self, *exc):
+		self.close()
+
+	def __len__ (self):
+		return len(self._idle)
+
+	def reset (self, symbol):
+		self._template.apply(symbol)
+
+	def acquire (self):
+		with self._lock:
+			expired = self._expire(time.monotonic())
+			if self._idle:
+				symbol = self._idle.pop()[0]
+				self.hits += 1
+			else:
+				symbol = None
+				self.misses += 1
+		for s in expired:
+			ZBarcode_Delete(s)
+		if symbol is None:
+			symbol = ZBarcode_Create()
+			if not symbol:
+				raise MemoryError('ZBarcode_Create() failed')
+			self.reset(symbol)
+		else:
+			_claim(symbol)
+		return symbol
+
+	def release (self, symbol):
+		_claim(symbol)
+		self.reset(symbol)
+		now = time.monotonic()
+		with self._lock:
+			expired = self._expire(now)
+			if len(self._idle) < self.maxsize:
+				self._idle.append((symbol, now))
+				symbol = None
+			else:
+				self.evictions += 1
+		for s in expired:
+			ZBarcode_Delete(s)
+		if symbol is not None:
+			ZBarcode_Delete(symbol)
+
+	@contextmanager
+	def borrow (self):
+		symbol = self.acquire()
+		try:
+			yield symbol
+		finally:
+			self.release(symbol)
+
+	def _expire (self, now):
+		# Idle handles are kept oldest first; caller holds the lock.
+		if self.idle_timeout is None:
+			return []
+		n = 0
+		while n < len(self._idle) and now - self._idle[n][1] > self.idle_timeout:
+			n += 1
+		expired = [s for s, t in self._idle[:n]]
+		del self._idle[:n]
+		self.evictions += n
+		return expired
+
+	def evict (self):
+		with self._lock:
+			expired = self._expire(time.monotonic())
+		for s in expired:
+			ZBarcode_Delete(s)
+		return len(expired)
+
+	def close (self):
+		with self._lock:
+			idle = [s for s, t in self._idle]
+			del self._idle[:]
+		for s in idle:
+			ZBarcode_Delete(s)
+
+	def stats (self):
+		with self._lock:
+			return {
+				'hits': self.hits, 'misses': self.misses,
+				'evictions': self.evictions, 'idle': len(self._idle),
+				'maxsize': self.maxsize
+			}
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+import hashlib
+import re
+import struct
+
+from .raster import packbits
+
+# Label printer commands for a Raster (see zint.raster; moduleraster()
+# gives one without ZBarcode_Buffer()), written to a binary file-like
+# object: a file, a pipe, a socket's makefile('wb') or a serial port.
+#
+# Graphics are cached by content: the first time a raster is sent it is
+# downloaded to the printer under a name derived from its hash and each
+# label only recalls it.  The writer remembers what it downloaded, not the
+# printer, so a new writer (or a printer restart) starts afresh.  With
+# capacity graphics stored the least recently used one is deleted first.
+
+def _key (image, bits):
+	return hashlib.sha1(struct.pack('>II', image.width, image.height) + bits).hexdigest()
+
+# ZPL's compressed ASCII hex: a repeat count before a hex digit, G-Y for
+# 1-19 and g-z for 20-400 in twenties, ',' for zeros and '!' for ones to
+# the end of the row and ':' for a copy of the previous row
+def _zpl_count (n):
+	out = []
+	if n >= 20:
+		out.append(chr(ord('g') + n // 20 - 1))
+	if n % 20:
+		out.append(chr(ord('G') + n % 20 - 1))
+	return ''.join(out)
+
+def _zpl_run (match):
+	run = match.group(0)
+	digit = run[0]
+	out = []
+	n = len(run)
+	while n:
+		chunk = min(n, 419)
+		out.append(_zpl_count(chunk) + digit)
+		n -= chunk
+	return ''.join(out)
+
+_runs = re.compile(r'([0-9A-F])\1+')
+
+def _zpl_rows (bits, stride):
+	previous = None
+	for offset in range(0, len(bits), stride):
+		row = bits[offset:offset + stride]
+		if row == previous:
+			yield ':'
+			continue
+		previous = row
+		text = row.hex().upper()
+		body = text.rstrip('0')
+		if len(body) < len(text) - 1:
+			text = body + ','
+		else:
+			body = text.rstrip('F')
+			if len(body) < len(text) - 1:
+				text = body + '!'
+		yield _runs.sub(_zpl_run, text)
+
+class ZPLWriter(object):
+	# device is where downloaded graphics go: R: is DRAM, E: flash
+	def __init__ (self, f, cache=True, capacity=64, device='R'):
+		self.f = f
+		self.cache = cache
+		self.capacity = capacity
+		self.device = device
+		self.stored = OrderedDict()
+
+	def _write_data (self, bits, stride):
+		# Streamed in blocks of rows rather than built as one string
+		block = []
+		for row in _zpl_rows(bits, stride):
+			block.append(row)
+			if len(block) == 64:
+				self.f.write(''.join(block).encode('ascii'))
+				block = []
+		self.f.write(''.join(block).encode('ascii'))
+
+	# Downloads the graphic with ~DG unless this writer already has and
+	# returns its object name
+	def download (self, image):
+		bits = packbits(image)
+		name = '%s:%s.GRF' % (self.device, _key(image, bits)[:8].upper())
+		if name in self.stored:
+			self.stored.move_to_end(name)
+			return name
+		while self.stored and len(self.stored) >= self.capacity:
+			old = self.stored.popitem(last=False)[0]
+			self.f.write(('^XA^ID%s^FS^XZ\n' % old).encode('ascii'))
+		stride = (image.width + 7) // 8
+		self.f.write(('~DG%s,%d,%d,' % (name, len(bits), stride)).encode('ascii'))
+		self._write_data(bits, stride)
+		self.f.write(b'\n')
+		self.stored[name] = True
+		return name
+
+	# One label with the graphic at x, y (dots).  Cached graphics are
+	# downloaded before the label and recalled with ^XG, others sent inline
+	# with ^GF.
+	def label (self, image, x=0, y=0, copies=1):
+		if self.cache:
+			name = self.download(image)
+			self.f.write(('^XA^FO%d,%d^XG%s,1,1^FS' % (x, y, name)).encode('ascii'))
+		else:
+			bits = packbits(image)
+			stride = (image.width + 7) // 8
+			self.f.write(('^XA^FO%d,%d^GFA,%d,%d,%d,' % (
+				x, y, len(bits), len(bits), stride)).encode('ascii'))
+			self._write_data(bits, stride)
+			self.f.write(b'^FS')
+		if copies > 1:
+			self.f.write(('^PQ%d' % copies).encode('ascii'))
+		self.f.write(b'^XZ\n')
+
+# EPL2 has no compressed graphics; GW takes raw rows with 0 for black
+_invert = bytes(bytearray(255 - i for i in range(256)))
+
+class EPLWriter(object):
+	def __init__ (self, f):
+		self.f = f
+
+	def label (self, image, x=0, y=0, copies=1):
+		bits = packbits(image)
+		stride = (image.width + 7) // 8
+		self.f.write(('\nN\nGW%d,%d,%d,%d,' % (x, y, stride, image.height)).encode('ascii'))
+		self.f.write(bits.translate(_invert))
+		self.f.write(('\nP%d\n' % copies).encode('ascii'))
+
+# ESC/POS.  Uncached images go out as GS v 0 raster in bands of band rows,
+# which printers with small buffers need.  Cached ones are defined as
+# download graphics (GS ( L function 83) under a two character key and
+# printed with function 85.
+class EscPosWriter(object):
+	keys = [struct.pack('BB', a, b) for a in range(33, 127) for b in range(33, 127)]
+
+	def __init__ (self, f, cache=False, capacity=64, band=256):
+		self.f = f
+		self.cache = cache
+		self.capacity = min(capacity, len(self.keys))
+		self.band = band
+		self.stored = OrderedDict()
+		self.free = list(reversed(self.keys))
+
+	def _graphics (self, fn, body):
+		# GS ( L takes up to 65535 parameter bytes, GS 8 L four byte lengths
+		body = struct.pack('BB', 0x30, fn) + body
+		if len(body) <= 0xffff:
+			self.f.write(b'\x1d(L' + struct.pack('<H', len(body)))
+		else:
+			self.f.write(b'\x1d8L' + struct.pack('<I', len(body)))
+		self.f.write(body)
+
+	def download (self, image):
+		bits = packbits(image)
+		name = _key(image, bits)
+		key = self.stored.get(name)
+		if key is not None:
+			self.stored.move_to_end(name)
+			return key
+		while self.stored and len(self.stored) >= self.capacity:
+			old = self.stored.popitem(last=False)[1]
+			self._graphics(0x52, old)
+			self.free.append(old)
+		key = self.free.pop()
+		self._graphics(0x53, b'\x30' + key + b'\x01' + struct.pack(
+			'<HH', image.width, image.height) + b'\x31' + bits)
+		self.stored[name] = key
+		return key
+
+	def image (self, image):
+		if self.cache:
+			self._graphics(0x55, self.download(image) + b'\x01\x01')
+			return
+		bits = packbits(image)
+		stride = (image.width + 7) // 8
+		for top in range(0, image.height, self.band):
+			rows = min(self.band, image.height - top)
+			self.f.write(b'\x1dv0\x00' + struct.pack('<HH', stride, rows))
+			self.f.write(bits[top * stride:(top + rows) * stride])
@@ -0,0 +1,203 @@
+from collections import namedtuple
+import struct
+import zlib
+
+from . import zint as _zint
+from .zint import _check_symbol, bitmapview
+from .matrix import modulematrix
+from .vector import _colour
+from .image import _chunk
+
+# The symbol's bitmap reduced to its two colours.  mode is
+#   '1'  packed one bit per pixel, most significant bit first, each row
+#        padded to a whole byte, 1 for foreground
+#   'P'  one byte per pixel, 0 for background and 1 for foreground
+#   'L'  one byte per pixel of grey
+# palette is (background, foreground) as RGB bytes and alpha their opacity
+# (0-255) when the symbol has an alphamap, otherwise None.
+Raster = namedtuple('Raster', ['width', 'height', 'mode', 'data', 'palette', 'alpha', 'dpmm'])
+
+# libzint only ever writes the foreground and background colours, bar
+# ULTRA's, which count as foreground here.  Without NumPy everything runs a
+# plane at a time through bytes.translate() and big integers, never a pixel
+# at a time.
+
+# _bits[k] maps a pixel flag to its bit in a byte of eight pixels
+_bits = [bytes(bytearray([0, 0x80 >> k])).ljust(256, b'\x00') for k in range(8)]
+
+def _rgb (value):
+	hexcolour, opacity = _colour(value)
+	return bytes(bytearray.fromhex(hexcolour)), int(round(opacity * 255))
+
+def _grey (rgb):
+	r, g, b = bytearray(rgb)
+	return (r * 299 + g * 587 + b * 114 + 500) // 1000
+
+def _channels (bg, fg, multicolour):
+	# With two colours one channel they differ in tells them apart
+	channels = [i for i in range(3) if bg[i] != fg[i]]
+	if multicolour or not channels:
+		return [0, 1, 2]
+	return channels[:1]
+
+def _ink (rgb, bg, channels, count):
+	# One byte per pixel, 1 where the pixel is not the background
+	data = bytes(rgb)
+	flags = 0
+	for i in channels:
+		table = bytearray(b'\x01' * 256)
+		table[bg[i]] = 0
+		plane = data[i::3].translate(bytes(table))
+		if len(channels) == 1:
+			return plane
+		flags |= int.from_bytes(plane, 'big')
+	return flags.to_bytes(count, 'big')
+
+def _pack (ink, width, height):
+	# Rows are padded to whole bytes, then every eighth pixel flag is
+	# turned into its bit and the eight planes ORed together
+	stride = (width + 7) // 8
+	pad = stride * 8 - width
+	if pad:
+		fill = bytes(pad)
+		ink = b''.join([ink[y * width:(y + 1) * width] + fill for y in range(height)])
+	packed = 0
+	for k in range(8):
+		packed |= int.from_bytes(ink[k::8].translate(_bits[k]), 'big')
+	return packed.to_bytes(stride * height, 'big')
+
+def _convert_numpy (rgb, bg, fg, channels, mode, width, height):
+	import numpy as np
+	pixels = np.frombuffer(rgb, dtype=np.uint8).reshape(height, width, 3)
+	ink = pixels[:, :, channels] != np.frombuffer(bg, dtype=np.uint8)[channels]
+	ink = ink.any(axis=2)
+	if mode == '1':
+		return np.packbits(ink, axis=1).tobytes()
+	if mode == 'P':
+		return ink.view(np.uint8).tobytes()
+	return np.where(ink, np.uint8(_grey(fg)), np.uint8(_grey(bg))).tobytes()
+
+def bitmapraster (symbol, mode='1', numpy=False):
+	_check_symbol(symbol)
+	if mode not in ('1', 'P', 'L'):
+		raise ValueError('unsupported raster mode %r' % mode)
+	c = symbol.contents
+	width, height = c.bitmap_width, c.bitmap_height
+	rgb = bitmapview(symbol)
+	bg, bg_alpha = _rgb(c.bgcolour)
+	fg, fg_alpha = _rgb(c.fgcolour)
+	alpha = None
+	if hasattr(_zint, 'alphamapview') and _zint.alphamapview(symbol) is not None:
+		alpha = (bg_alpha, fg_alpha)
+	multicolour = c.symbology == getattr(_zint, 'BARCODE_ULTRA', None)
+	channels = _channels(bytearray(bg), bytearray(fg), multicolour)
+	if numpy:
+		data = _convert_numpy(rgb, bg, fg, channels, mode, width, height)
+	else:
+		ink = _ink(rgb, bytearray(bg), channels, width * height)
+		if mode == '1':
+			data = _pack(ink, width, height)
+		elif mode == 'P':
+			data = ink
+		else:
+			table = bytearray(256)
+			table[0], table[1] = _grey(bg), _grey(fg)
+			data = ink.translate(bytes(table))
+	return Raster(width, height, mode, data, (bg, fg), alpha, getattr(c, 'dpmm', 0.0))
+
+# Mode '1' raster straight from the encoded modules, dots to a module, so
+# no ZBarcode_Buffer() is needed.  Only the modules are drawn: no quiet
+# zones, border or human readable text.  Rows with no row_height of their
+# own share what is left of the symbol's height, as in libzint.
+def moduleraster (symbol, dots=2):
+	matrix = modulematrix(symbol)
+	c = symbol.contents
+	heights = list(matrix.row_height)
+	fixed = sum(heights)
+	unset = heights.count(0)
+	if unset:
+		share = max(c.height - fixed, unset) / float(unset)
+		heights = [h or share for h in heights]
+	width = matrix.width * dots
+	stride = (matrix.width + 7) // 8
+	out_stride = (width + 7) // 8
+	pad = '0' * (out_stride * 8 - width)
+	data = []
+	total = 0.0
+	top = 0
+	for r in range(matrix.rows):
+		row = matrix.data[r * stride:(r + 1) * stride]
+		digits = format(int.from_bytes(row, 'big'), '0%db' % (stride * 8))[:matrix.width]
+		digits = digits.replace('1', '1' * dots).replace('0', '0' * dots) + pad
+		# Row boundaries are rounded from the running total so they don't
+		# drift
+		total += heights[r]
+		bottom = int(round(total * dots))
+		data.append(int(digits, 2).to_bytes(out_stride, 'big') * (bottom - top))
+		top = bottom
+	bg, bg_alpha = _rgb(c.bgcolour)
+	fg, fg_alpha = _rgb(c.fgcolour)
+	return Raster(width, top, '1', b''.join(data), (bg, fg), None, getattr(c, 'dpmm', 0.0))
+
+# Packed rows of a 'P' or 'L' raster, for writers that want bits.  'L' is
+# thresholded halfway between the two greys.
+def packbits (image):
+	if image.mode == '1':
+		return image.data
+	ink = image.data
+	if image.mode == 'L':
+		bg, fg = _grey(image.palette[0]), _grey(image.palette[1])
+		table = bytearray(256)
+		for v in range(256):
+			table[v] = abs(v - fg) < abs(v - bg)
+		ink = ink.translate(bytes(table))
+	return _pack(ink, image.width, image.height)
+
+# Bilevel or greyscale PNG.  '1' and 'P' are written as a two entry
+# palette, one or eight bits deep, with the alpha in a tRNS chunk.
+def write_png (image, f, level=6):
+	width, height = image.width, image.height
+	if image.mode == 'L':
+		depth, colour_type, stride = 8, 0, width
+	else:
+		depth, colour_type = (1, 3) if image.mode == '1' else (8, 3)
+		stride = (width + 7) // 8 if image.mode == '1' else width
+	f.write(b'\x89PNG\r\n\x1a\n')
+	f.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, depth, colour_type, 0, 0, 0)))
+	if colour_type == 3:
+		f.write(_chunk(b'PLTE', image.palette[0] + image.palette[1]))
+		if image.alpha is not None:
+			f.write(_chunk(b'tRNS', bytes(bytearray(image.alpha))))
+	elif image.alpha is not None and image.alpha[0] == 0:
+		f.write(_chunk(b'tRNS', struct.pack('>H', _grey(image.palette[0]))))
+	if image.dpmm:
+		ppm = int(round(image.dpmm * 1000))
+		f.write(_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+	data = image.data
+	raw = b'\x00' + b'\x00'.join([data[y * stride:(y + 1) * stride] for y in range(height)])
+	f.write(_chunk(b'IDAT', zlib.compress(raw, level)))
+	f.write(_chunk(b'IEND', b''))
+
+# Netpbm: PBM (P4) for '1' and 'P', where 1 is black as in the raster, and
+# PGM (P5) for 'L'
+def write_pnm (image, f):
+	if image.mode == 'L':
+		f.write(('P5\n%d %d\n255\n' % (image.width, image.height)).encode('ascii'))
+		f.write(image.data)
+	else:
+		f.write(('P4\n%d %d\n' % (image.width, image.height)).encode('ascii'))
+		f.write(packbits(image))
+
+# Pillow image, e.g. to save a TIFF with compression='group4'.  Mode '1'
+# rasters become Pillow mode '1' images, which are white where a bit is
+# set, so the bits are read inverted.
+def toimage (image):
+	from PIL import Image
+	size = (image.width, image.height)
+	if image.mode == '1':
+		return Image.frombytes('1', size, image.data, 'raw', '1;I')
+	if image.mode == 'L':
+		return Image.frombytes('L', size, image.data)
+	result = Image.frombytes('P', size, image.data)
+	result.putpalette(image.palette[0] + image.palette[1])
+	return result
@@ -0,0 +1,261 @@
+import os
+import struct
+import zlib
+
+from .zint import (
+	ZBarcode_Create, ZBarcode_Delete, ZBarcode_Encode_and_Buffer,
+	ZINT_ERROR_TOO_LONG, _as_template, _check_symbol, _input_buffer,
+	bitmapview
+)
+from .image import _chunk
+
+# A page of columns x rows equal cells held as one RGB buffer.  place()
+# copies a symbol's bitmap row by row straight into the next cell, so
+# building a page never needs more than the page and the symbol being
+# placed.  Sizes are in pixels; dpmm only goes into the written files.
+class Sheet(object):
+	def __init__ (self, width, height, columns, rows, margin=0, gutter=0,
+			label_height=0, background=b'\xff\xff\xff', dpmm=0.0):
+		self.width = width
+		self.height = height
+		self.columns = columns
+		self.rows = rows
+		self.margin = margin
+		self.gutter = gutter
+		self.label_height = label_height
+		self.background = bytes(background)
+		self.dpmm = dpmm
+		self.cell_width = (width - 2 * margin - (columns - 1) * gutter) // columns
+		self.cell_height = (height - 2 * margin - (rows - 1) * gutter) // rows
+		if self.cell_width <= 0 or self.cell_height - label_height <= 0:
+			raise ValueError('no room for %dx%d cells on a %dx%d page' % (
+				columns, rows, width, height))
+		self.page = bytearray(width * height * 3)
+		self.clear()
+
+	def __len__ (self):
+		return self.count
+
+	@property
+	def full (self):
+		return self.count >= self.columns * self.rows
+
+	def clear (self):
+		# A row at a time so clearing never holds a second page
+		page = memoryview(self.page)
+		row = self.background * self.width
+		for offset in range(0, len(self.page), len(row)):
+			page[offset:offset + len(row)] = row
+		self.count = 0
+
+	# Top left corner of cell index, filled row by row
+	def cell (self, index):
+		column, row = index % self.columns, index // self.columns
+		return (
+			self.margin + column * (self.cell_width + self.gutter),
+			self.margin + row * (self.cell_height + self.gutter)
+		)
+
+	def _blit (self, x, y, width, height, pixels):
+		page = memoryview(self.page)
+		stride = self.width * 3
+		size = width * 3
+		for r in range(height):
+			offset = (y + r) * stride + x * 3
+			page[offset:offset + size] = pixels[r * size:(r + 1) * size]
+
+	# Copies the symbol's bitmap, centred, into the next free cell and
+	# returns the cell's index.  label needs Pillow.
+	def place (self, symbol, label=None):
+		_check_symbol(symbol)
+		if self.full:
+			raise ValueError('sheet is full')
+		width = symbol.contents.bitmap_width
+		height = symbol.contents.bitmap_height
+		room = self.cell_height - self.label_height
+		if width > self.cell_width or height > room:
+			raise ValueError('%dx%d bitmap does not fit a %dx%d cell' % (
+				width, height, self.cell_width, room))
+		x, y = self.cell(self.count)
+		self._blit(
+			x + (self.cell_width - width) // 2, y + (room - height) // 2,
+			width, height, bitmapview(symbol)
+		)
+		if label is not None and self.label_height:
+			self._label(x, y + room, label)
+		self.count += 1
+		return self.count - 1
+
+	def _label (self, x, y, text):
+		from PIL import Image, ImageDraw, ImageFont
+		size = (self.cell_width, self.label_height)
+		image = Image.new('RGB', size, tuple(bytearray(self.background)))
+		draw = ImageDraw.Draw(image)
+		font = ImageFont.load_default()
+		left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+		draw.text(
+			((size[0] - right + left) // 2 - left, (size[1] - bottom + top) // 2 - top),
+			text, fill=(0, 0, 0), font=font
+		)
+		self._blit(x, y, size[0], size[1], image.tobytes())
+
+	def _rows (self):
+		page = memoryview(self.page)
+		stride = self.width * 3
+		for r in range(self.height):
+			yield page[r * stride:(r + 1) * stride]
+
+	# PNG with the IDAT split into chunks as the compressor produces them
+	def write_png (self, f, level=6):
+		f.write(b'\x89PNG\r\n\x1a\n')
+		f.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)))
+		if self.dpmm:
+			ppm = int(round(self.dpmm * 1000))
+			f.write(_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+		compressor = zlib.compressobj(level)
+		for row in self._rows():
+			data = compressor.compress(b'\x00') + compressor.compress(row)
+			if data:
+				f.write(_chunk(b'IDAT', data))
+		f.write(_chunk(b'IDAT', compressor.flush()))
+		f.write(_chunk(b'IEND', b''))
+
+	# Uncompressed baseline RGB TIFF, the page written as a single strip
+	def write_tiff (self, f):
+		entries = [
+			(256, 4, 1, self.width),
+			(257, 4, 1, self.height),
+			(258, 3, 3, None),
+			(259, 3, 1, 1),
+			(262, 3, 1, 2),
+			(273, 4, 1, None),
+			(277, 3, 1, 3),
+			(278, 4, 1, self.height),
+			(279, 4, 1, len(self.page)),
+			(282, 5, 1, None),
+			(283, 5, 1, None),
+			(296, 3, 1, 3)
+		]
+		ifd = 8
+		extra = ifd + 2 + len(entries) * 12 + 4
+		bits = extra
+		resolution = bits + 6
+		pixels = resolution + 8
+		# pixels per centimetre as a rational
+		ppcm = int(round((self.dpmm or 72 / 25.4) * 1000))
+		out = [struct.pack('<2sHI', b'II', 42, ifd), struct.pack('<H', len(entries))]
+		for tag, kind, count, value in entries:
+			if tag == 258:
+				value = bits
+			elif tag == 273:
+				value = pixels
+			elif tag in (282, 283):
+				value = resolution
+			if kind == 3 and count == 1:
+				out.append(struct.pack('<HHIHH', tag, kind, count, value, 0))
+			else:
+				out.append(struct.pack('<HHII', tag, kind, count, value))
+		out.append(struct.pack('<I', 0))
+		out.append(struct.pack('<HHH', 8, 8, 8))
+		out.append(struct.pack('<II', ppcm, 100))
+		f.write(b''.join(out))
+		f.write(self.page)
+
+	# One page PDF showing the page as an image.  The stream is written as
+	# it is compressed and its length given afterwards as object 6.
+	def write_pdf (self, f):
+		scale = 72 / 25.4 / self.dpmm if self.dpmm else 1.0
+		w, h = self.width * scale, self.height * scale
+		content = ('q %.4f 0 0 %.4f 0 0 cm /Im1 Do Q' % (w, h)).encode('ascii')
+		objects = [
+			b'<< /Type /Catalog /Pages 2 0 R >>',
+			b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+			('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] '
+				'/Resources << /XObject << /Im1 5 0 R >> >> /Contents 4 0 R >>' % (w, h)).encode('ascii'),
+			('<< /Length %d >>\nstream\n' % len(content)).encode('ascii') + content + b'\nendstream',
+			None,
+			None
+		]
+		offsets = []
+		offset = 0
+		head = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+		f.write(head)
+		offset += len(head)
+		for n, body in enumerate(objects, 1):
+			offsets.append(offset)
+			if n == 5:
+				head = ('5 0 obj\n<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+					'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode '
+					'/Length 6 0 R >>\nstream\n' % (self.width, self.height)).encode('ascii')
+				f.write(head)
+				offset += len(head)
+				length = 0
+				compressor = zlib.compressobj()
+				for row in self._rows():
+					data = compressor.compress(row)
+					f.write(data)
+					length += len(data)
+				data = compressor.flush()
+				f.write(data)
+				length += len(data)
+				tail = b'\nendstream\nendobj\n'
+				f.write(tail)
+				offset += length + len(tail)
+				continue
+			if n == 6:
+				body = ('%d' % length).encode('ascii')
+			obj = ('%d 0 obj\n' % n).encode('ascii') + body + b'\nendobj\n'
+			f.write(obj)
+			offset += len(obj)
+		xref = ['xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)]
+		xref.extend('%010d 00000 n \n' % o for o in offsets)
+		xref.append('trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+			len(objects) + 1, offset))
+		f.write(''.join(xref).encode('ascii'))
+
+	# Format from the extension: .png, .tif/.tiff or .pdf
+	def save (self, path):
+		ext = os.path.splitext(path)[1].lower()
+		writers = {
+			'.png': self.write_png, '.tif': self.write_tiff,
+			'.tiff': self.write_tiff, '.pdf': self.write_pdf
+		}
+		if ext not in writers:
+			raise ValueError('unsupported sheet format %r' % ext)
+		with open(path, 'wb') as f:
+			writers[ext](f)
+
+# Encodes inputs (data or (data, label)) with template and imposes them on
+# sheet, saving each page as path % page_number (from 1) when it fills and
+# the last partial one at the end.  Returns the paths written.  One symbol
+# is reused throughout; an encode error raises ValueError.
+def impose (inputs, sheet, path, template=None, rotate_angle=0):
+	template = _as_template(template)
+	symbol = ZBarcode_Create()
+	if not symbol:
+		raise MemoryError('ZBarcode_Create() failed')
+	written = []
+	try:
+		sheet.clear()
+		for item in inputs:
+			if isinstance(item, tuple):
+				data, label = item
+			else:
+				data, label = item, None
+			template.apply(symbol)
+			source, length = _input_buffer(data)
+			ret = ZBarcode_Encode_and_Buffer(symbol, source, length, rotate_angle)
+			if ret >= ZINT_ERROR_TOO_LONG:
+				raise ValueError('%r: %s' % (data, symbol.contents.errtxt.decode('ascii', 'replace')))
+			sheet.place(symbol, label)
+			if sheet.full:
+				written.append(path % (len(written) + 1))
+				sheet.save(written[-1])
+				sheet.clear()
+		if len(sheet):
+			written.append(path % (len(written) + 1))
+			sheet.save(written[-1])
+			sheet.clear()
+	finally:
+		ZBarcode_Delete(symbol)
+	return written
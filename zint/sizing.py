@@ -0,0 +1,185 @@
+from collections import namedtuple
+from math import ceil, floor
+
+from . import zint as _zint
+from .zint import (
+	BARCODE_MICROQR, BARCODE_PDF417, BARCODE_QRCODE, ZBarcode_Buffer,
+	ZBarcode_Encode, ZINT_ERROR_TOO_LONG, SymbolTemplate, _input_buffer
+)
+
+# What Sizer settled on: the options to encode with, the zint scale and
+# X-dimension (mm) for the resolution, and the symbol's size on the label
+# in mm, quiet zones and text included.
+Fit = namedtuple('Fit', ['option_1', 'option_2', 'option_3', 'scale', 'xdim', 'width', 'height'])
+
+# QR alphanumeric mode characters
+_alnum = b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+
+# Inputs of one length and class encode alike, which is what the memo is
+# keyed on
+def _class (data):
+	if data.isdigit():
+		return 'numeric'
+	if not data.translate(None, _alnum):
+		return 'alnum'
+	if max(bytearray(data)) < 0x80:
+		return 'ascii'
+	return 'binary'
+
+# Version from the symbol width, for symbologies whose version can be fixed
+# in option_2 so that every label of a class comes out the same size
+_versions = {
+	BARCODE_QRCODE: lambda width: (width - 17) // 4,
+	BARCODE_MICROQR: lambda width: (width - 9) // 2
+}
+
+# PDF417 width in modules is 17 per data column plus start, stop and row
+# indicator columns
+_pdf417 = {BARCODE_PDF417: 69}
+if hasattr(_zint, 'BARCODE_PDF417COMP'):
+	_pdf417[_zint.BARCODE_PDF417COMP] = 35
+
+def _footprint (symbol):
+	# Size in X-dimensions as rendered, so quiet zones, whitespace and
+	# human readable text count.  A vector layout is cheaper than a bitmap.
+	c = symbol.contents
+	scale = c.scale or 1.0
+	if hasattr(_zint, 'ZBarcode_Buffer_Vector'):
+		if _zint.ZBarcode_Buffer_Vector(symbol, 0) >= ZINT_ERROR_TOO_LONG:
+			raise ValueError(c.errtxt.decode('ascii', 'replace'))
+		v = c.vector.contents
+		return v.width / (2 * scale), v.height / (2 * scale)
+	c.scale = 0.5
+	try:
+		if ZBarcode_Buffer(symbol, 0) >= ZINT_ERROR_TOO_LONG:
+			raise ValueError(c.errtxt.decode('ascii', 'replace'))
+		return c.bitmap_width, c.bitmap_height
+	finally:
+		c.scale = scale
+
+# Sizes symbols to fit a width x height mm box at dpmm dots per mm.  The X
+# dimension aimed for is xdim, by default ZBarcode_Default_Xdim() where the
+# library has it, and is shrunk to whole dots until the symbol fits; below
+# min_xdim (or one dot) the payload is too big for the box.  ecc is the
+# least error correction (option_1), which QR raises by itself when the
+# version has room.
+#
+# The first payload of a length and character class is encoded with the
+# version left to libzint, measured and, for PDF417, re-encoded once with
+# the number of columns that best matches the box.  Later payloads of the
+# same length and class reuse that result and are encoded once; if the
+# symbol comes out bigger the search runs again for it.
+class Sizer(object):
+	def __init__ (self, symbology, width, height, dpmm=12.0, ecc=0,
+			xdim=None, min_xdim=0.0, options=None):
+		self.symbology = symbology
+		self.width = width
+		self.height = height
+		self.dpmm = dpmm
+		self.options = dict(options or {})
+		self.options['symbology'] = symbology
+		if ecc:
+			self.options['option_1'] = ecc
+		if xdim is None and hasattr(_zint, 'ZBarcode_Default_Xdim'):
+			xdim = _zint.ZBarcode_Default_Xdim(symbology)
+		self.xdim = xdim
+		self.min_xdim = max(min_xdim, 1.0 / dpmm)
+		self.template = SymbolTemplate(self.options)
+		self.memo = {}
+		self.hits = self.misses = self.encodes = 0
+
+	def _encode (self, symbol, template, source, length):
+		template.apply(symbol)
+		self.encodes += 1
+		ret = ZBarcode_Encode(symbol, source, length)
+		if ret >= ZINT_ERROR_TOO_LONG:
+			raise ValueError(symbol.contents.errtxt.decode('ascii', 'replace'))
+
+	def _scale (self, size):
+		fits = min(self.width / size[0], self.height / size[1])
+		if self.xdim:
+			fits = min(fits, self.xdim)
+		dots = floor(fits * self.dpmm + 1e-9)
+		xdim = dots / float(self.dpmm)
+		if dots < 1 or xdim < self.min_xdim - 1e-9:
+			return None, None
+		if hasattr(_zint, 'ZBarcode_Scale_From_XdimDp'):
+			return _zint.ZBarcode_Scale_From_XdimDp(self.symbology, xdim, self.dpmm, None), xdim
+		return dots / 2.0, xdim
+
+	def _columns (self, symbol, size):
+		# Rows x columns from the first encode bound the codewords; pick the
+		# column count whose symbol allows the largest X in the box
+		c = symbol.contents
+		overhead = _pdf417[self.symbology]
+		columns = (c.width - overhead) // 17
+		cells = columns * c.rows
+		extra = size[0] - c.width
+		row_height = size[1] / float(c.rows)
+		best = best_x = None
+		for n in range(1, 31):
+			rows = max(3, int(ceil(cells / float(n))))
+			if rows > 90:
+				continue
+			x = min(self.width / (17 * n + overhead + extra), self.height / (rows * row_height))
+			if best_x is None or x > best_x:
+				best, best_x = n, x
+		return best if best != columns else None
+
+	def _search (self, symbol, source, length):
+		self._encode(symbol, self.template, source, length)
+		size = _footprint(symbol)
+		options = {}
+		if self.symbology in _pdf417 and not self.options.get('option_2'):
+			columns = self._columns(symbol, size)
+			if columns is not None:
+				template = SymbolTemplate(dict(self.options, option_2=columns))
+				try:
+					self._encode(symbol, template, source, length)
+					wider = _footprint(symbol)
+				except ValueError:
+					self._encode(symbol, self.template, source, length)
+				else:
+					if min(self.width / wider[0], self.height / wider[1]) > min(self.width / size[0], self.height / size[1]):
+						options['option_2'] = columns
+						size = wider
+					else:
+						self._encode(symbol, self.template, source, length)
+		elif self.symbology in _versions and not self.options.get('option_2'):
+			options['option_2'] = _versions[self.symbology](symbol.contents.width)
+		scale, xdim = self._scale(size)
+		if scale is None:
+			raise ValueError('%d x %d module symbol does not fit %g x %g mm at %g dots/mm' % (
+				size[0], size[1], self.width, self.height, self.dpmm))
+		c = symbol.contents
+		options = dict(self.options, scale=scale, **options)
+		fit = Fit(
+			options.get('option_1', 0), options.get('option_2', 0), options.get('option_3', 0),
+			scale, xdim, size[0] * xdim, size[1] * xdim
+		)
+		return fit, SymbolTemplate(options), (c.width, c.rows)
+
+	# Encodes data into symbol sized for the box, ready for ZBarcode_Buffer()
+	# or ZBarcode_Print(), and returns the Fit.  Raises ValueError if it
+	# cannot be encoded or does not fit.
+	def encode (self, symbol, data):
+		source, length = _input_buffer(data)
+		key = (length, _class(bytes(data)))
+		entry = self.memo.get(key)
+		if entry is not None:
+			fit, template, shape = entry
+			try:
+				self._encode(symbol, template, source, length)
+			except ValueError:
+				pass
+			else:
+				c = symbol.contents
+				if c.width <= shape[0] and c.rows <= shape[1]:
+					self.hits += 1
+					return fit
+		self.misses += 1
+		entry = self._search(symbol, source, length)
+		self.memo[key] = entry
+		fit, template, shape = entry
+		symbol.contents.scale = fit.scale
+		return fit
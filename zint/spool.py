@@ -0,0 +1,168 @@
+from collections import namedtuple
+import mmap
+import os
+import struct
+import threading
+
+from .zint import _check_symbol, bitmapview
+
+# A spool is two files: path holds the frames' bytes back to back and
+# path.idx one (offset, length, width, height) record per frame in the
+# order they were added.  Spool writes them, SpoolReader maps them back.
+
+_data_magic = b'ZINTSPOOL1\n\x00\x00\x00\x00\x00'
+_index_magic = b'ZINTIDX1'
+_record = struct.Struct('<QQII')
+
+Frame = namedtuple('Frame', ['width', 'height', 'data'])
+
+# Frames are copied straight from the symbol's bitmap into a window of the
+# file mapped with mmap.  Only the window is mapped, and the index goes
+# through an ordinary buffered file, so memory use stays the same however
+# many frames are written.  The file grows a window at a time and is cut
+# to size on close().
+#
+# append() may be called from several threads and doubles as an extract
+# function for encode_parallel() with threads, which then returns each
+# input's frame number.
+class Spool(object):
+	def __init__ (self, path, window=32 << 20):
+		granularity = mmap.ALLOCATIONGRANULARITY
+		self.path = path
+		self.window = max(window - window % granularity, granularity)
+		self.count = 0
+		self._data = open(path, 'w+b')
+		self._data.write(_data_magic)
+		self._data.flush()
+		self._index = open(path + '.idx', 'wb')
+		self._index.write(_index_magic)
+		self._size = len(_data_magic)
+		self._capacity = self._size
+		self._map = None
+		self._map_start = self._map_end = 0
+		self._lock = threading.Lock()
+
+	def __enter__ (self):
+		return self
+
+	def __exit__ (self, *exc):
+		self.close()
+
+	def __len__ (self):
+		return self.count
+
+	@property
+	def size (self):
+		return self._size
+
+	def _reserve (self, length):
+		# Maps a window of the file covering the next length bytes
+		start = self._size
+		end = start + length
+		if self._map is not None and end <= self._map_end:
+			return
+		if self._map is not None:
+			self._map.close()
+			self._map = None
+		base = start - start % mmap.ALLOCATIONGRANULARITY
+		size = max(self.window, end - base)
+		if base + size > self._capacity:
+			self._capacity = base + size
+			self._data.truncate(self._capacity)
+		self._map = mmap.mmap(self._data.fileno(), size, offset=base)
+		self._map_start, self._map_end = base, base + size
+
+	# Adds data (anything exposing a buffer) as a frame and returns its
+	# number
+	def append_bytes (self, width, height, data):
+		view = memoryview(data).cast('B')
+		length = view.nbytes
+		with self._lock:
+			if self._data is None:
+				raise ValueError('spool is closed')
+			self._reserve(length)
+			offset = self._size
+			at = offset - self._map_start
+			self._map[at:at + length] = view
+			self._size += length
+			self._index.write(_record.pack(offset, length, width, height))
+			self.count += 1
+			return self.count - 1
+
+	# Adds the symbol's RGB bitmap as a frame and returns its number
+	def append (self, symbol):
+		_check_symbol(symbol)
+		c = symbol.contents
+		return self.append_bytes(c.bitmap_width, c.bitmap_height, bitmapview(symbol))
+
+	extract = append
+
+	# Makes what has been written so far visible to a SpoolReader
+	def flush (self):
+		with self._lock:
+			if self._map is not None:
+				self._map.flush()
+			self._index.flush()
+
+	def close (self):
+		with self._lock:
+			if self._data is None:
+				return
+			if self._map is not None:
+				self._map.close()
+				self._map = None
+			self._data.truncate(self._size)
+			self._data.close()
+			self._index.close()
+			self._data = None
+
+# Frames are memoryviews into the mapped file, so nothing is copied until
+# they are used, e.g. numpy.frombuffer(frame.data, numpy.uint8) or
+# f.write(frame.data).  They must be released before close().
+class SpoolReader(object):
+	def __init__ (self, path):
+		self.path = path
+		with open(path, 'rb') as f:
+			if f.read(len(_data_magic)) != _data_magic:
+				raise ValueError('%s is not a spool' % path)
+			self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		with open(path + '.idx', 'rb') as f:
+			if f.read(len(_index_magic)) != _index_magic:
+				raise ValueError('%s.idx is not a spool index' % path)
+			size = os.fstat(f.fileno()).st_size
+			# A record cut short by a crash is ignored
+			self.count = (size - len(_index_magic)) // _record.size
+			self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		self._view = memoryview(self._data)
+
+	def __enter__ (self):
+		return self
+
+	def __exit__ (self, *exc):
+		self.close()
+
+	def __len__ (self):
+		return self.count
+
+	# (offset, length, width, height) of frame n
+	def entry (self, n):
+		if n < 0:
+			n += self.count
+		if not 0 <= n < self.count:
+			raise IndexError('frame %d out of range' % n)
+		return _record.unpack_from(self._index, len(_index_magic) + n * _record.size)
+
+	def frame (self, n):
+		offset, length, width, height = self.entry(n)
+		return Frame(width, height, self._view[offset:offset + length])
+
+	__getitem__ = frame
+
+	def __iter__ (self):
+		for n in range(self.count):
+			yield self.frame(n)
+
+	def close (self):
+		self._view.release()
+		self._data.close()
+		self._index.close()
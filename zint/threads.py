@@ -0,0 +1,164 @@
+from contextlib import contextmanager
+from ctypes import POINTER, c_void_p, cast
+import threading
+import weakref
+
+from . import zint as _zint
+from .zint import ZBarcode_Create, ZBarcode_Delete, _as_template, _claim
+from .metrics import _swap
+
+# libzint keeps all of an encode's state in its zint_symbol, so separate
+# handles may be used from as many threads as you like, but one handle
+# must only ever be used by one thread at a time.  That covers reading
+# errtxt, bitmap or vector after the call too: they belong to the handle
+# until its next call.  LocalSymbols gives every thread a handle of its
+# own; set_debug() catches a handle used from a thread that doesn't own it.
+
+class _Handle(object):
+	__slots__ = ('symbol', 'owner', 'busy', 'finalizer', '__weakref__')
+
+	def __init__ (self, symbol, owner):
+		self.symbol = symbol
+		self.owner = owner
+		self.busy = False
+		self.finalizer = None
+
+def _delete (handles, lock, key, symbol):
+	with lock:
+		handles.pop(key, None)
+	ZBarcode_Delete(symbol)
+
+# One handle per thread, created on the thread's first get() and deleted
+# when the thread ends or close() is called.  borrow() resets it from
+# template first, like SymbolPool.borrow(), and refuses to nest in one
+# thread since the inner user would clobber the outer one's results.
+class LocalSymbols(object):
+	def __init__ (self, template=None):
+		self._template = _as_template(template)
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._handles = weakref.WeakValueDictionary()
+
+	def __enter__ (self):
+		return self
+
+	def __exit__ (self, *exc):
+		self.close()
+
+	def __len__ (self):
+		return len(self._handles)
+
+	def _handle (self):
+		handle = getattr(self._local, 'handle', None)
+		if handle is None or handle.symbol is None:
+			symbol = ZBarcode_Create()
+			if not symbol:
+				raise MemoryError('ZBarcode_Create() failed')
+			self._template.stamp(symbol)
+			key = cast(symbol, c_void_p).value
+			handle = _Handle(symbol, threading.get_ident())
+			handle.finalizer = weakref.finalize(
+				handle, _delete, self._handles, self._lock, key, symbol)
+			with self._lock:
+				self._handles[key] = handle
+			self._local.handle = handle
+		return handle
+
+	# This thread's handle as it was left by its last use
+	def get (self):
+		return self._handle().symbol
+
+	@contextmanager
+	def borrow (self):
+		handle = self._handle()
+		if handle.busy:
+			raise RuntimeError('this thread is already using its zint_symbol')
+		handle.busy = True
+		try:
+			self._template.apply(handle.symbol)
+			yield handle.symbol
+		finally:
+			handle.busy = False
+
+	# Raises RuntimeError if symbol is one of these handles and belongs to
+	# another thread
+	def check (self, symbol):
+		handle = self._handles.get(cast(symbol, c_void_p).value)
+		if handle is not None and handle.owner != threading.get_ident():
+			raise RuntimeError('zint_symbol belongs to thread %d, not %d' % (
+				handle.owner, threading.get_ident()))
+
+	# Deletes every thread's handle; threads using them must be done
+	def close (self):
+		with self._lock:
+			handles = list(self._handles.values())
+		for handle in handles:
+			handle.symbol = None
+			handle.finalizer()
+
+_originals = {}
+_debug_lock = threading.Lock()
+
+def _debug_wrap (name, func, owners, busy):
+	argtypes = getattr(func, 'argtypes', None) or []
+	if name == 'ZBarcode_Create':
+		def wrapper (*args):
+			symbol = func(*args)
+			if symbol:
+				owners[cast(symbol, c_void_p).value] = threading.get_ident()
+			return symbol
+	elif argtypes and argtypes[0] is POINTER(_zint.zint_symbol):
+		delete = name == 'ZBarcode_Delete'
+		def wrapper (symbol, *args):
+			key = cast(symbol, c_void_p).value
+			me = threading.get_ident()
+			owner = owners.setdefault(key, me)
+			# Any thread may delete a handle nobody is using, as pools and
+			# executors do when they shut down
+			if owner != me and not (delete and key not in busy):
+				raise RuntimeError('%s: zint_symbol %#x belongs to thread %d, used from %d' % (
+					name, key, owner, me))
+			busy[key] = me
+			try:
+				return func(symbol, *args)
+			finally:
+				busy.pop(key, None)
+				if delete:
+					owners.pop(key, None)
+	else:
+		return func
+	wrapper.__name__ = name
+	wrapper.__wrapped__ = func
+	return wrapper
+
+# Debug mode: every binding taking a zint_symbol checks that the calling
+# thread owns it, i.e. created it or last claimed it with claim(), and
+# raises RuntimeError otherwise.  Like zint.metrics it swaps the bindings,
+# so it costs nothing while off.  Turn it on before creating handles and
+# off after uninstrument() if both are used.
+def set_debug (enabled=True):
+	with _debug_lock:
+		if _originals:
+			_swap(dict((n, (w, f)) for n, (f, w) in _originals.items()))
+			_originals.clear()
+			_zint._symbol_owners = None
+		if not enabled:
+			return
+		owners = {}
+		busy = {}
+		for name in _zint.__all__:
+			if name.startswith('ZBarcode_'):
+				func = getattr(_zint, name)
+				wrapper = _debug_wrap(name, func, owners, busy)
+				if wrapper is not func:
+					_originals[name] = (func, wrapper)
+		_zint._symbol_owners = owners
+		_swap(_originals)
+
+def debugging ():
+	return bool(_originals)
+
+# Hands symbol to the calling thread in debug mode; SymbolPool does this
+# on acquire() and release()
+def claim (symbol):
+	_claim(symbol)
@@ -0,0 +1,428 @@
+from array import array
+from collections import namedtuple
+from ctypes import c_char, c_float, c_int, c_void_p, cast, string_at
+import io
+import math
+import struct
+import zlib
+
+from . import zint as _zint
+from .zint import _check_symbol
+
+# Colours of zint_vector_rect.colour values 1 to 8 (UltraCode)
+_rect_colours = {
+	1: '00FFFF', 2: '0000FF', 3: 'FF00FF', 4: 'FF0000',
+	5: 'FFFF00', 6: '00FF00', 7: '000000', 8: 'FFFFFF'
+}
+
+def _colour (value):
+	# (RRGGBB, opacity) from an RRGGBB, RRGGBBAA or "C,M,Y,K" string
+	value = value.decode('ascii')
+	if ',' in value:
+		c, m, y, k = [float(v) / 100 for v in value.split(',')]
+		rgb = [int(round(255 * (1 - v) * (1 - k))) for v in (c, m, y)]
+		return '%02X%02X%02X' % tuple(rgb), 1.0
+	if len(value) == 8:
+		return value[:6].upper(), int(value[6:], 16) / 255.0
+	return value.upper(), 1.0
+
+def _num (v):
+	return ('%.2f' % v).rstrip('0').rstrip('.')
+
+def _hexagon (x, y, diameter, rotation):
+	r = diameter / 2.0
+	a, b = r * 0.8660254, r / 2.0
+	if rotation in (90, 270):
+		return [(x - r, y), (x - b, y - a), (x + b, y - a),
+			(x + r, y), (x + b, y + a), (x - b, y + a)]
+	return [(x, y - r), (x + a, y - b), (x + a, y + b),
+		(x, y + r), (x - a, y + b), (x - a, y - b)]
+
+def _escape (text):
+	return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _vector (symbol):
+	_check_symbol(symbol)
+	vector = symbol.contents.vector
+	if not vector:
+		raise ValueError('symbol has no vector, call ZBarcode_Buffer_Vector() first')
+	return vector.contents
+
+# Struct-of-arrays view of a zint_vector: one dict of equal length columns
+# per primitive kind.  Columns missing from older libzint layouts (hexagon
+# and string rotation, string halign, circle width) are filled with 0 so
+# every version yields the same shape.
+VectorArrays = namedtuple('VectorArrays', [
+	'width', 'height', 'rectangles', 'hexagons', 'circles', 'strings'
+])
+
+_columns = {
+	'rectangles': (('x', 'f'), ('y', 'f'), ('width', 'f'), ('height', 'f'), ('colour', 'i')),
+	'hexagons': (('x', 'f'), ('y', 'f'), ('diameter', 'f'), ('rotation', 'i')),
+	'circles': (('x', 'f'), ('y', 'f'), ('diameter', 'f'), ('width', 'f'), ('colour', 'i')),
+	'strings': (
+		('x', 'f'), ('y', 'f'), ('fsize', 'f'), ('width', 'f'),
+		('length', 'i'), ('rotation', 'i'), ('halign', 'i')
+	)
+}
+_layouts = {}
+
+def _layout (cls):
+	# struct.Struct with native alignment matches the C (and ctypes) layout
+	# of a list node, so each node is unpacked in one call straight from its
+	# address instead of through a ctypes attribute lookup per field.
+	layout = _layouts.get(cls)
+	if layout is None:
+		codes = {c_float: 'f', c_int: 'i'}
+		names = [f[0] for f in cls._fields_]
+		node = struct.Struct('@' + ''.join(codes.get(f[1], 'P') for f in cls._fields_))
+		layout = _layouts[cls] = (node, names, c_char * node.size)
+	return layout
+
+def _flatten (head, cls, kind):
+	node, names, raw = _layout(cls)
+	inext = names.index('next')
+	unpack, at = node.unpack_from, raw.from_address
+	rows = []
+	addr = cast(head, c_void_p).value
+	while addr:
+		row = unpack(at(addr))
+		rows.append(row)
+		addr = row[inext]
+	values = list(zip(*rows)) or [()] * len(names)
+	columns = {}
+	for name, code in _columns[kind]:
+		if name in names:
+			columns[name] = array(code, values[names.index(name)])
+		else:
+			columns[name] = array(code, bytes(len(rows) * array(code).itemsize))
+	if kind == 'strings':
+		columns['text'] = [
+			string_at(t).decode('utf-8') for t in values[names.index('text')]
+		]
+	return columns
+
+def vectorarrays (symbol, numpy=False):
+	vector = _vector(symbol)
+	kinds = {}
+	for kind, cls in (
+			('rectangles', _zint.zint_vector_rect),
+			('hexagons', _zint.zint_vector_hexagon),
+			('circles', _zint.zint_vector_circle),
+			('strings', _zint.zint_vector_string)):
+		kinds[kind] = _flatten(getattr(vector, kind), cls, kind)
+	if numpy:
+		import numpy as np
+		dtypes = {'f': np.float32, 'i': np.int32}
+		for kind, columns in kinds.items():
+			for name, code in _columns[kind]:
+				columns[name] = np.frombuffer(columns[name], dtype=dtypes[code])
+	return VectorArrays(vector.width, vector.height, **kinds)
+
+def _merge_spans (groups, build):
+	merged = []
+	for key, spans in groups.items():
+		spans.sort()
+		start, end = spans[0][0], spans[0][0] + spans[0][1]
+		for a, length in spans[1:]:
+			if a <= end + 0.001:
+				end = max(end, a + length)
+			else:
+				merged.append(build(key, start, end - start))
+				start, end = a, a + length
+		merged.append(build(key, start, end - start))
+	return merged
+
+# Join rectangles of the same x, width and colour that touch or overlap
+# vertically, then those of the same y, height and colour that touch
+# horizontally.  This collapses the per-module rectangles older libzint
+# emits; newer releases already give one rectangle per horizontal run, of
+# which this rarely joins any more.  Returns (x, y, width, height, colour)
+# tuples top to bottom, left to right.
+def merge_rects (x, y, width, height, colour):
+	columns = {}
+	for i in range(len(x)):
+		columns.setdefault((x[i], width[i], colour[i]), []).append((y[i], height[i]))
+	rects = _merge_spans(columns, lambda k, a, n: (k[0], a, k[1], n, k[2]))
+	rows = {}
+	for rx, ry, rw, rh, rc in rects:
+		rows.setdefault((ry, rh, rc), []).append((rx, rw))
+	merged = _merge_spans(rows, lambda k, a, n: (a, k[0], n, k[1], k[2]))
+	merged.sort(key=lambda r: (r[1], r[0]))
+	return merged
+
+def _runs (mask):
+	# (start, end) of each run of set bits in mask, lowest first
+	while mask:
+		low = mask & -mask
+		mask += low
+		high = mask & -mask
+		mask ^= high
+		yield low.bit_length() - 1, high.bit_length() - 1
+
+# Outline of the union of rectangles as closed loops of (x, y) corners,
+# each running clockwise round a filled region and anticlockwise round a
+# hole, so the nonzero fill rule paints exactly the rectangles.  Edges are
+# snapped to multiples of 1 / scale first, so sides that differ only by
+# float rounding meet, and the corners are returned in those units.
+def outline_rects (x, y, width, height, scale=100):
+	rects = []
+	for i in range(len(x)):
+		x0, y0 = int(round(x[i] * scale)), int(round(y[i] * scale))
+		x1 = int(round((x[i] + width[i]) * scale))
+		y1 = int(round((y[i] + height[i]) * scale))
+		if x1 > x0 and y1 > y0:
+			rects.append((x0, y0, x1, y1))
+	if not rects:
+		return []
+	xs = sorted(set([r[0] for r in rects] + [r[2] for r in rects]))
+	ys = sorted(set([r[1] for r in rects] + [r[3] for r in rects]))
+	xi = dict((v, i) for i, v in enumerate(xs))
+	yi = dict((v, i) for i, v in enumerate(ys))
+	# The cells of the grid the edges make that are covered, as a bitmask
+	# per band (bit i for column i) and per column (bit j for band j),
+	# with an empty one at either end
+	bands = [0] * (len(ys) + 1)
+	columns = [0] * (len(xs) + 1)
+	for x0, y0, x1, y1 in rects:
+		a, b, c, d = xi[x0], xi[x1], yi[y0], yi[y1]
+		run = (1 << b) - (1 << a)
+		for j in range(c + 1, d + 1):
+			bands[j] |= run
+		run = (1 << d) - (1 << c)
+		for i in range(a + 1, b + 1):
+			columns[i] |= run
+	# Boundary sides keyed by start corner.  Each is a whole run of cells
+	# with filled on the same side, so every end is a corner.
+	sides = {}
+	for j, y in enumerate(ys):
+		above, below = bands[j], bands[j + 1]
+		for a, b in _runs(below & ~above):
+			sides.setdefault((xs[a], y), []).append((xs[b], y))
+		for a, b in _runs(above & ~below):
+			sides.setdefault((xs[b], y), []).append((xs[a], y))
+	for i, x in enumerate(xs):
+		left, right = columns[i], columns[i + 1]
+		for c, d in _runs(right & ~left):
+			sides.setdefault((x, ys[d]), []).append((x, ys[c]))
+		for c, d in _runs(left & ~right):
+			sides.setdefault((x, ys[c]), []).append((x, ys[d]))
+	loops = []
+	while sides:
+		start = corner = next(iter(sides))
+		loop = []
+		while True:
+			loop.append(corner)
+			ends = sides[corner]
+			end = ends.pop()
+			if not ends:
+				del sides[corner]
+			corner = end
+			if corner == start:
+				break
+		loops.append(loop)
+	return loops
+
+def _rects (arrays, merge):
+	r = arrays.rectangles
+	columns = (r['x'], r['y'], r['width'], r['height'], r['colour'])
+	if merge:
+		return merge_rects(*columns)
+	return list(zip(*columns))
+
+def _strings (arrays):
+	s = arrays.strings
+	return zip(
+		s['x'], s['y'], s['fsize'], s['width'], s['rotation'], s['halign'],
+		s['text']
+	)
+
+def _outline_path (loops, scale=100):
+	# Absolute move to the first loop, then relative moves between loop
+	# starts (where "z" leaves the current point) and relative h/v sides.
+	# The last side of each loop is left to "z".
+	d = []
+	px = py = 0
+	for n, loop in enumerate(loops):
+		x, y = loop[0]
+		d.append('%s%s %s' % (n and 'm' or 'M', _num((x - px) / float(scale)), _num((y - py) / float(scale))))
+		px, py = x, y
+		for cx, cy in loop[1:]:
+			if cy == y:
+				d.append('h%s' % _num((cx - x) / float(scale)))
+			else:
+				d.append('v%s' % _num((cy - y) / float(scale)))
+			x, y = cx, cy
+		d.append('z')
+	return ''.join(d)
+
+# Write symbol's vector as SVG to the binary file-like object f, one list
+# at a time.  With merge the rectangles of each colour are drawn as the
+# outlines of the regions they cover, in one path of relative h/v moves,
+# otherwise as one subpath per rectangle.
+def write_svg (symbol, f, merge=True):
+	c = symbol.contents
+	arrays = vectorarrays(symbol)
+	fg, fg_opacity = _colour(c.fgcolour)
+	bg, bg_opacity = _colour(c.bgcolour)
+	w, h = _num(arrays.width), _num(arrays.height)
+	out = [
+		'<?xml version="1.0" standalone="no"?>\n',
+		'<svg width="%s" height="%s" viewBox="0 0 %s %s" version="1.1" xmlns="http://www.w3.org/2000/svg">\n' % (w, h, w, h),
+		' <desc>Zint Generated Symbol</desc>\n',
+		' <g id="barcode" fill="#%s"%s>\n' % (
+			fg, fg_opacity < 1 and ' fill-opacity="%.3f"' % fg_opacity or ''),
+		'  <rect x="0" y="0" width="%s" height="%s" fill="#%s"%s/>\n' % (
+			w, h, bg, bg_opacity < 1 and ' fill-opacity="%.3f"' % bg_opacity or '')
+	]
+	f.write(''.join(out).encode('utf-8'))
+	paths = {}
+	if merge:
+		r = arrays.rectangles
+		colours = {}
+		for i, rc in enumerate(r['colour']):
+			colours.setdefault(rc, []).append(i)
+		for rc, index in colours.items():
+			paths[rc] = _outline_path(outline_rects(
+				[r['x'][i] for i in index], [r['y'][i] for i in index],
+				[r['width'][i] for i in index], [r['height'][i] for i in index]))
+	else:
+		for rx, ry, rw, rh, rc in _rects(arrays, False):
+			paths.setdefault(rc, []).append(
+				'M%s %sh%sv%sh-%sZ' % (_num(rx), _num(ry), _num(rw), _num(rh), _num(rw)))
+		paths = dict((rc, ''.join(d)) for rc, d in paths.items())
+	out = []
+	for rc, d in paths.items():
+		if rc == -1:
+			f.write(('  <path d="%s"/>\n' % d).encode('utf-8'))
+		else:
+			out.append('  <path d="%s" fill="#%s"/>\n' % (d, _rect_colours.get(rc, fg)))
+	hx = arrays.hexagons
+	hexagons = []
+	for x, y, diameter, rotation in zip(hx['x'], hx['y'], hx['diameter'], hx['rotation']):
+		hexagons.append('M%sZ' % 'L'.join(
+			'%s %s' % (_num(px), _num(py)) for px, py in _hexagon(x, y, diameter, rotation)))
+	if hexagons:
+		out.append('  <path d="%s"/>\n' % ''.join(hexagons))
+	ci = arrays.circles
+	for x, y, diameter, width, colour in zip(ci['x'], ci['y'], ci['diameter'], ci['width'], ci['colour']):
+		colour = colour and bg or fg
+		if width:
+			out.append('  <circle cx="%s" cy="%s" r="%s" stroke="#%s" stroke-width="%s" fill="none"/>\n' % (
+				_num(x), _num(y), _num(diameter / 2.0), colour, _num(width)))
+		else:
+			out.append('  <circle cx="%s" cy="%s" r="%s" fill="#%s"/>\n' % (
+				_num(x), _num(y), _num(diameter / 2.0), colour))
+	anchors = {0: 'middle', 1: 'start', 2: 'end'}
+	for x, y, fsize, width, rotation, halign, text in _strings(arrays):
+		transform = ''
+		if rotation:
+			transform = ' transform="rotate(%d,%s,%s)"' % (rotation, _num(x), _num(y))
+		out.append('  <text x="%s" y="%s" text-anchor="%s" font-family="Helvetica, sans-serif" font-size="%s"%s>%s</text>\n' % (
+			_num(x), _num(y), anchors.get(halign, 'middle'), _num(fsize),
+			transform, _escape(text)))
+	out.append(' </g>\n</svg>\n')
+	f.write(''.join(out).encode('utf-8'))
+
+def _pdf_rgb (hexcolour):
+	return ' '.join(
+		_num(int(hexcolour[i:i + 2], 16) / 255.0) for i in (0, 2, 4)
+	)
+
+def _pdf_string (text):
+	text = text.encode('latin-1', 'replace').decode('latin-1')
+	return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+# Write the page content stream for symbol's vector (PDF operators, one
+# unit per point, origin bottom left) to the binary file-like object f.
+# Text uses the font resource /F1.
+def write_pdf_content (symbol, f, merge=True):
+	c = symbol.contents
+	arrays = vectorarrays(symbol)
+	height = arrays.height
+	fg = _colour(c.fgcolour)[0]
+	bg = _colour(c.bgcolour)[0]
+	out = [
+		'%s rg\n0 0 %s %s re f\n' % (_pdf_rgb(bg), _num(arrays.width), _num(height)),
+		'%s rg\n' % _pdf_rgb(fg)
+	]
+	colour = -1
+	pending = False
+	for rx, ry, rw, rh, rc in _rects(arrays, merge):
+		if rc != colour:
+			if pending:
+				out.append('f\n')
+			out.append('%s rg\n' % _pdf_rgb(fg if rc == -1 else _rect_colours.get(rc, fg)))
+			colour = rc
+		out.append('%s %s %s %s re\n' % (_num(rx), _num(height - ry - rh), _num(rw), _num(rh)))
+		pending = True
+	if pending:
+		out.append('f\n')
+	if colour != -1:
+		out.append('%s rg\n' % _pdf_rgb(fg))
+	f.write(''.join(out).encode('ascii'))
+	out = []
+	hx = arrays.hexagons
+	for x, y, diameter, rotation in zip(hx['x'], hx['y'], hx['diameter'], hx['rotation']):
+		points = _hexagon(x, y, diameter, rotation)
+		out.append('%s %s m %s h\n' % (
+			_num(points[0][0]), _num(height - points[0][1]),
+			' '.join('%s %s l' % (_num(px), _num(height - py)) for px, py in points[1:])))
+	if out:
+		out.append('f\n')
+	k = 0.5523
+	ci = arrays.circles
+	for x, y, diameter, width, colour in zip(ci['x'], ci['y'], ci['diameter'], ci['width'], ci['colour']):
+		y, r = height - y, diameter / 2.0
+		out.append('%s rg %s RG\n' % ((_pdf_rgb(colour and bg or fg),) * 2))
+		out.append('%s %s m %s %s %s %s %s %s c %s %s %s %s %s %s c %s %s %s %s %s %s c %s %s %s %s %s %s c\n' % tuple(_num(v) for v in (
+			x + r, y,
+			x + r, y + k * r, x + k * r, y + r, x, y + r,
+			x - k * r, y + r, x - r, y + k * r, x - r, y,
+			x - r, y - k * r, x - k * r, y - r, x, y - r,
+			x + k * r, y - r, x + r, y - k * r, x + r, y)))
+		if width:
+			out.append('%s w S\n' % _num(width))
+		else:
+			out.append('f\n')
+	for x, y, fsize, width, rotation, halign, text in _strings(arrays):
+		dx = {1: 0, 2: -width}.get(halign, -width / 2.0)
+		a = math.radians(-rotation)
+		out.append('%s rg q %s %s %s %s %s %s cm BT /F1 %s Tf %s 0 Td (%s) Tj ET Q\n' % (
+			_pdf_rgb(fg), _num(math.cos(a)), _num(math.sin(a)), _num(-math.sin(a)),
+			_num(math.cos(a)), _num(x), _num(height - y), _num(fsize),
+			_num(dx), _pdf_string(text)))
+	f.write(''.join(out).encode('latin-1'))
+
+# Write symbol's vector as a single page PDF document to the binary
+# file-like object f
+def write_pdf (symbol, f, merge=True):
+	vector = _vector(symbol)
+	content = io.BytesIO()
+	write_pdf_content(symbol, content, merge)
+	stream = zlib.compress(content.getvalue())
+	objects = [
+		b'<< /Type /Catalog /Pages 2 0 R >>',
+		b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+		('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s %s] '
+			'/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>' % (
+			_num(vector.width), _num(vector.height))).encode('ascii'),
+		('<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(stream)).encode('ascii') +
+			stream + b'\nendstream',
+		b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'
+	]
+	offset = 0
+	offsets = []
+	head = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+	f.write(head)
+	offset += len(head)
+	for n, body in enumerate(objects, 1):
+		obj = ('%d 0 obj\n' % n).encode('ascii') + body + b'\nendobj\n'
+		offsets.append(offset)
+		f.write(obj)
+		offset += len(obj)
+	xref = ['xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)]
+	xref.extend('%010d 00000 n \n' % o for o in offsets)
+	xref.append('trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+		len(objects) + 1, offset))
+	f.write(''.join(xref).encode('ascii'))
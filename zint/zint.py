@@ -26,8 +26,14 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from ctypes import POINTER, Structure, c_char, c_char_p, c_float, c_int, c_ubyte, c_uint, cast, cdll, create_string_buffer
-from ._version import __version__
+from _thread import RLock
+from ctypes import POINTER, Structure, _Pointer, addressof, byref, c_char, c_char_p, c_float, c_int, c_ubyte, c_uint, c_void_p, cast, cdll, create_string_buffer, memmove, string_at
+
+# Loading only opens libzint and reads its version, which the constants
+# below depend on.  The structure layouts and the ZBarcode_*() bindings are
+# built for that version on the first lookup of one of their names, through
+# __getattr__ at the end of this module, as is __version__.  Code in here
+# reaches them with _get().
 
 try:
 	_lib = cdll.LoadLibrary('libzint.so')
@@ -296,346 +302,583 @@ ZINT_ERR_SIZE = 100
 FILENAME_MAX = 256
 
 def instr (text):
-	l = len(text) + 1
-	return (c_ubyte * l).from_buffer_copy(create_string_buffer(text))
+	# NUL terminated copy of text; the zeroed array supplies the terminator
+	l = len(text)
+	buf = (c_ubyte * (l + 1))()
+	memmove(buf, text, l)
+	return buf
 
 def infile (path):
 	return create_string_buffer(path)
 
-def bitmapbuf (z):
-	if not type(z) is POINTER(zint_symbol):
+def _check_symbol (z):
+	symbol = POINTER(_get('zint_symbol'))
+	if not type(z) is symbol:
 		raise TypeError(
 			'Expected %s not %s' % (
-				str(type(POINTER(zint_symbol))),
+				str(type(symbol)),
 				str(type(z))
 			)
 		)
+
+# Thread owning each handle, by address, while zint.threads' debug mode is
+# on.  Code handing a handle to another thread on purpose claims it there.
+_symbol_owners = None
+
+def _claim (z):
+	if _symbol_owners is not None:
+		# Only reached in debug mode, which has imported threading already
+		from threading import get_ident
+		_symbol_owners[cast(z, c_void_p).value] = get_ident()
+
+def _input_buffer (data):
+	# data as passed to the ZBarcode_Encode*() bindings (see _source) and
+	# its explicit length, so payloads may contain NUL bytes
+	if isinstance(data, bytes):
+		return data, len(data)
+	return data, memoryview(data).nbytes
+
+class _source(object):
+	# argtype for the source of the ZBarcode_Encode*() bindings.  On top of
+	# what POINTER(c_ubyte) takes (instr() arrays, pointers, None) it
+	# accepts any buffer: bytes are passed in place, since libzint never
+	# writes to its input, writable contiguous buffers such as bytearray,
+	# mmap or NumPy arrays by address and everything else as one copy.
+	# Pass the length explicitly; only bytes and instr() are NUL terminated.
+	# Pointers expose a buffer too, their own few bytes, so they are
+	# passed on as pointers before the buffer cases.
+	_pointer = POINTER(c_ubyte)
+
+	@classmethod
+	def from_param (cls, obj):
+		if isinstance(obj, bytes):
+			return obj
+		if isinstance(obj, _Pointer):
+			return cls._pointer.from_param(obj)
+		if isinstance(obj, (c_char_p, c_void_p)):
+			return cast(obj, cls._pointer)
+		try:
+			view = memoryview(obj)
+		except TypeError:
+			return cls._pointer.from_param(obj)
+		if not view.nbytes:
+			# libzint falls back to strlen() for a zero length
+			return b''
+		if view.readonly or not view.c_contiguous:
+			return view.tobytes()
+		return byref(c_ubyte.from_buffer(obj))
+
+def _pin (data):
+	# Pointer into data's own memory and its length.  bytes are read in
+	# place (libzint never writes to its input), writable contiguous
+	# buffers are exported, which locks a bytearray against resizing while
+	# the returned pointer lives, and anything else is copied once.
+	if not isinstance(data, bytes):
+		view = memoryview(data)
+		if not view.readonly and view.c_contiguous and view.nbytes:
+			view = view.cast('B')
+			return cast((c_ubyte * view.nbytes).from_buffer(view), POINTER(c_ubyte)), view.nbytes
+		data = view.tobytes()
+	return cast(c_char_p(data), POINTER(c_ubyte)), len(data)
+
+def bitmapbuf (z):
+	_check_symbol(z)
 	blen = z.contents.bitmap_width * z.contents.bitmap_height * 3
 	return cast(z.contents.bitmap, POINTER(c_char * blen))[0]
 
-if __libzint_ver >= 20604:
-	class zint_vector_rect(Structure):
-		pass
-	zint_vector_rect._fields_ = [
-		('x', c_float),
-		('y', c_float),
-		('height', c_float),
-		('width', c_float),
-		('colour', c_int),
-		('next', POINTER(zint_vector_rect))
-	]
-	
-	class zint_vector_hexagon(Structure):
-		pass
-	fields = [
-		('x', c_float),
-		('y', c_float),
-		('diameter', c_float)
-	]
-	if __libzint_ver >= 21000:
-		fields.append(('rotation', c_int))
-	fields.append(('next', POINTER(zint_vector_hexagon)))
-	zint_vector_hexagon._fields_ = fields
-	
-	class zint_vector_string(Structure):
-		pass
-	fields = [
-		('x', c_float),
-		('y', c_float),
-		('fsize', c_float),
-		('width', c_float),
-		('length', c_int)
-	]
-	if __libzint_ver >= 21000:
-		fields.extend([
-			('rotation', c_int),
-			('halign', c_int)
-		])
-	fields.extend([
-		('text', POINTER(c_ubyte)),
-		('next', POINTER(zint_vector_string))
-	])
-	zint_vector_string._fields_ = fields
-	
-	class zint_vector_circle(Structure):
-		pass
-	fields = [
-		('x', c_float),
-		('y', c_float),
-		('diameter', c_float)
-	]
-	if __libzint_ver >= 21100:
-		fields.append(('width', c_float))
-	fields.extend([
-		('colour', c_int),
-		('next', POINTER(zint_vector_circle))
-	])
-	zint_vector_circle._fields_ = fields
-	
-	class zint_vector(Structure):
-		_fields_ = [
-			('width', c_float),
-			('height', c_float),
-			('rectangles', POINTER(zint_vector_rect)),
-			('hexagons', POINTER(zint_vector_hexagon)),
-			('strings', POINTER(zint_vector_string)),
-			('circles', POINTER(zint_vector_circle))
-		]
+# The views below alias memory owned by libzint unless copy is true.  They
+# are only valid until the symbol is next buffered, cleared or deleted.
+def _mapview (ptr, blen, copy):
+	buf = cast(ptr, POINTER(c_ubyte * blen))[0]
+	if copy:
+		return memoryview(bytearray(buf))
+	return memoryview(buf).cast('B')
 
-if __libzint_ver <= 20900:
-	class zint_render_line(Structure):
-		_fields_ = [
+def bitmapview (z, copy=False):
+	_check_symbol(z)
+	c = z.contents
+	if not c.bitmap:
+		raise ValueError('symbol has no bitmap, call ZBarcode_Buffer() first')
+	return _mapview(c.bitmap, c.bitmap_width * c.bitmap_height * 3, copy)
+
+def bitmaparray (z, copy=False):
+	import numpy
+	c = z.contents
+	view = bitmapview(z, copy)
+	return numpy.frombuffer(view, dtype=numpy.uint8).reshape(
+		c.bitmap_height, c.bitmap_width, 3
+	)
+
+if __libzint_ver >= 20901:
+	def alphamapview (z, copy=False):
+		_check_symbol(z)
+		c = z.contents
+		# libzint only allocates an alphamap when a colour has an alpha
+		# channel
+		if not c.alphamap:
+			return None
+		return _mapview(c.alphamap, c.bitmap_width * c.bitmap_height, copy)
+
+	def alphamaparray (z, copy=False):
+		import numpy
+		c = z.contents
+		view = alphamapview(z, copy)
+		if view is None:
+			return None
+		return numpy.frombuffer(view, dtype=numpy.uint8).reshape(
+			c.bitmap_height, c.bitmap_width
+		)
+
+# Structure layouts for the loaded libzint, built by _layouts() on the
+# first lookup of any of them (see __getattr__ below).  The vector ones are
+# left to _vector_layouts(): symbol->vector stays NULL until a Print or
+# Vector call, and binding one of those builds them first.
+_layout_names = frozenset([
+	'zint_render_line', 'zint_render_string', 'zint_render_ring',
+	'zint_render_hexagon', 'zint_render', 'zint_structapp', 'zint_symbol',
+	'zint_seg'
+])
+_vector_names = frozenset([
+	'zint_vector_rect', 'zint_vector_hexagon', 'zint_vector_string',
+	'zint_vector_circle', 'zint_vector'
+])
+
+def _vector_layouts ():
+	global zint_vector_rect, zint_vector_hexagon, zint_vector_string
+	global zint_vector_circle, zint_vector
+	if __libzint_ver >= 20604:
+		class zint_vector_rect(Structure):
+			pass
+		zint_vector_rect._fields_ = [
 			('x', c_float),
 			('y', c_float),
-			('length', c_float),
+			('height', c_float),
 			('width', c_float),
-			('next', POINTER(zint_render_line))
+			('colour', c_int),
+			('next', POINTER(zint_vector_rect))
 		]
 
-	class zint_render_string(Structure):
-		_fields_ = [
+		class zint_vector_hexagon(Structure):
+			pass
+		fields = [
 			('x', c_float),
 			('y', c_float),
-			('length', c_float),
-			('width', c_int),
-			('text', POINTER(c_ubyte)),
-			('next', POINTER(zint_render_string))
+			('diameter', c_float)
 		]
+		if __libzint_ver >= 21000:
+			fields.append(('rotation', c_int))
+		fields.append(('next', POINTER(zint_vector_hexagon)))
+		zint_vector_hexagon._fields_ = fields
 
-	class zint_render_ring(Structure):
-		_fields_ = [
+		class zint_vector_string(Structure):
+			pass
+		fields = [
 			('x', c_float),
 			('y', c_float),
-			('radius', c_float),
-			('line_width', c_float),
-			('next', POINTER(zint_render_ring))
+			('fsize', c_float),
+			('width', c_float),
+			('length', c_int)
 		]
+		if __libzint_ver >= 21000:
+			fields.extend([
+				('rotation', c_int),
+				('halign', c_int)
+			])
+		fields.extend([
+			('text', POINTER(c_ubyte)),
+			('next', POINTER(zint_vector_string))
+		])
+		zint_vector_string._fields_ = fields
 
-	class zint_render_hexagon(Structure):
-		pass
-	fields = [
-		('x', c_float),
-		('y', c_float)
-	]
-	if __libzint_ver >= 20602:
-		fields.append(('height', c_float))
-	fields.append(('next', POINTER(zint_render_hexagon)))
-	zint_render_hexagon._fields_ = fields
+		class zint_vector_circle(Structure):
+			pass
+		fields = [
+			('x', c_float),
+			('y', c_float),
+			('diameter', c_float)
+		]
+		if __libzint_ver >= 21100:
+			fields.append(('width', c_float))
+		fields.extend([
+			('colour', c_int),
+			('next', POINTER(zint_vector_circle))
+		])
+		zint_vector_circle._fields_ = fields
 
-	class zint_render(Structure):
-		_fields_ = [
+		# Declared by _layouts() for zint_symbol's pointer to it
+		zint_vector = dict(_get('zint_symbol')._fields_)['vector']._type_
+		zint_vector._fields_ = [
 			('width', c_float),
 			('height', c_float),
-			('lines', POINTER(zint_render_line)),
-			('strings', POINTER(zint_render_string)),
-			('rings', POINTER(zint_render_ring)),
-			('hexagons', POINTER(zint_render_hexagon))
+			('rectangles', POINTER(zint_vector_rect)),
+			('hexagons', POINTER(zint_vector_hexagon)),
+			('strings', POINTER(zint_vector_string)),
+			('circles', POINTER(zint_vector_circle))
 		]
 
-if __libzint_ver >= 21100:
-	class zint_structapp(Structure):
-		_fields_ = [
-			('index', c_int),
-			('count', c_int),
-			('id', (c_char * 32))
-		]
+def _layouts ():
+	global zint_render_line, zint_render_string, zint_render_ring
+	global zint_render_hexagon, zint_render, zint_structapp, zint_symbol
+	global zint_seg
+	if __libzint_ver >= 20604:
+		class zint_vector(Structure):
+			pass
 
-class zint_symbol(Structure):
-	pass
-fields = [('symbology', c_int)]
-if __libzint_ver >= 21000:
-	fields.append(('height', c_float))
-else:
-	fields.append(('height', c_int))
-if __libzint_ver >= 21100:
-	fields.append(('scale', c_float))
-fields.append(('whitespace_width', c_int))
-if __libzint_ver >= 21000:
-	fields.append(('whitespace_height', c_int))
-fields.extend([
-	('border_width', c_int),
-	('output_options', c_int),
-	('fgcolour', (c_char * ZINT_COLOUR_SIZE))
-])
-if __libzint_ver >= 21000 or __libzint_ver < 20901:
-	fields.append(('bgcolour', (c_char * ZINT_COLOUR_SIZE)))
-else: # __libzint_ver == 20901:
-	fields.append(('fgcolor', POINTER(c_char)))
-	fields.append(('bgcolour', (c_char * ZINT_COLOUR_SIZE)))
-	fields.append(('bgcolor', POINTER(c_char)))
-if __libzint_ver >= 21000:
-	fields.append(('fgcolor', POINTER(c_char)))
-	fields.append(('bgcolor', POINTER(c_char)))
-fields.append(('outfile', (c_char * FILENAME_MAX)))
-if __libzint_ver < 21100:
-	fields.append(('scale', c_float))
-if __libzint_ver >= 21100:
-	fields.append(('primary', (c_char * ZINT_PRIMARY_SIZE)))
-fields.extend([
-	('option_1', c_int),
-	('option_2', c_int),
-	('option_3', c_int),
-	('show_hrt', c_int)
-])
-if __libzint_ver >= 20603:
-	fields.append(('fontsize', c_int))
-fields.extend([
-	('input_mode', c_int),
-	('eci', c_int)
-])
-if __libzint_ver >= 21200:
-	fields.append(('dpmm', c_float))
-if __libzint_ver >= 21100:
-	fields.extend([
-		('dot_size', c_float),
-		('guard_descent', c_float),
-		('structapp', zint_structapp),
-		('warn_level', c_int),
-		('debug', c_int)
-	])
-fields.extend([
-	('text', (c_ubyte * ZINT_TEXT_SIZE)),
-	('rows', c_int),
-	('width', c_int)
-])
-if __libzint_ver < 21100:
-	fields.append(('primary', (c_char * ZINT_PRIMARY_SIZE)))
-fields.append(('encoded_data', ((c_ubyte * ZINT_COLS_MAX) * ZINT_ROWS_MAX)))
-if __libzint_ver >= 21000:
-	fields.append(('row_height', (c_float * ZINT_ROWS_MAX)))
-else:
-	fields.append(('row_height', (c_int * ZINT_ROWS_MAX)))
-fields.append(('errtxt', (c_char * ZINT_ERR_SIZE)))
-if __libzint_ver >= 20800:
-	fields.append(('bitmap', POINTER(c_ubyte)))
-else:
-	fields.append(('bitmap', POINTER(c_char)))
-fields.extend([
-	('bitmap_width', c_int),
-	('bitmap_height', c_int)
-])
-if __libzint_ver >= 20901:
-	fields.append(('alphamap', POINTER(c_ubyte)))
-fields.append(('bitmap_byte_length', c_uint))
-if __libzint_ver < 21100:
-	fields.append(('dot_size', c_float))
-if __libzint_ver >= 20604:
-	fields.append(('vector', POINTER(zint_vector)))
-if __libzint_ver <= 20900:
-	fields.append(('rendered', POINTER(zint_render)))
-if __libzint_ver < 21100:
-	fields.append(('debug', c_int))
-	if __libzint_ver >= 21000:
-		fields.append(('warn_level', c_int))
-zint_symbol._fields_ = fields
+	if __libzint_ver <= 20900:
+		class zint_render_line(Structure):
+			_fields_ = [
+				('x', c_float),
+				('y', c_float),
+				('length', c_float),
+				('width', c_float),
+				('next', POINTER(zint_render_line))
+			]
 
-if __libzint_ver >= 21100:
-	class zint_seg(Structure):
-		_fields_ = [
-			('source', POINTER(c_ubyte)),
-			('length', c_int),
-			('eci', c_int)
+		class zint_render_string(Structure):
+			_fields_ = [
+				('x', c_float),
+				('y', c_float),
+				('length', c_float),
+				('width', c_int),
+				('text', POINTER(c_ubyte)),
+				('next', POINTER(zint_render_string))
+			]
+
+		class zint_render_ring(Structure):
+			_fields_ = [
+				('x', c_float),
+				('y', c_float),
+				('radius', c_float),
+				('line_width', c_float),
+				('next', POINTER(zint_render_ring))
+			]
+
+		class zint_render_hexagon(Structure):
+			pass
+		fields = [
+			('x', c_float),
+			('y', c_float)
 		]
+		if __libzint_ver >= 20602:
+			fields.append(('height', c_float))
+		fields.append(('next', POINTER(zint_render_hexagon)))
+		zint_render_hexagon._fields_ = fields
 
-ZBarcode_Create = _lib.ZBarcode_Create
-ZBarcode_Create.restype = POINTER(zint_symbol)
-ZBarcode_Create.argtypes = []
+		class zint_render(Structure):
+			_fields_ = [
+				('width', c_float),
+				('height', c_float),
+				('lines', POINTER(zint_render_line)),
+				('strings', POINTER(zint_render_string)),
+				('rings', POINTER(zint_render_ring)),
+				('hexagons', POINTER(zint_render_hexagon))
+			]
 
-ZBarcode_Delete = _lib.ZBarcode_Delete
-ZBarcode_Delete.restype = None
-ZBarcode_Delete.argtypes = [POINTER(zint_symbol)]
+	if __libzint_ver >= 21100:
+		class zint_structapp(Structure):
+			_fields_ = [
+				('index', c_int),
+				('count', c_int),
+				('id', (c_char * 32))
+			]
 
-ZBarcode_Encode = _lib.ZBarcode_Encode
-ZBarcode_Encode.restype = c_int
-ZBarcode_Encode.argtypes = [POINTER(zint_symbol), POINTER(c_ubyte), c_int]
+	class zint_symbol(Structure):
+		pass
+	fields = [('symbology', c_int)]
+	if __libzint_ver >= 21000:
+		fields.append(('height', c_float))
+	else:
+		fields.append(('height', c_int))
+	if __libzint_ver >= 21100:
+		fields.append(('scale', c_float))
+	fields.append(('whitespace_width', c_int))
+	if __libzint_ver >= 21000:
+		fields.append(('whitespace_height', c_int))
+	fields.extend([
+		('border_width', c_int),
+		('output_options', c_int),
+		('fgcolour', (c_char * ZINT_COLOUR_SIZE))
+	])
+	if __libzint_ver >= 21000 or __libzint_ver < 20901:
+		fields.append(('bgcolour', (c_char * ZINT_COLOUR_SIZE)))
+	else: # __libzint_ver == 20901:
+		fields.append(('fgcolor', POINTER(c_char)))
+		fields.append(('bgcolour', (c_char * ZINT_COLOUR_SIZE)))
+		fields.append(('bgcolor', POINTER(c_char)))
+	if __libzint_ver >= 21000:
+		fields.append(('fgcolor', POINTER(c_char)))
+		fields.append(('bgcolor', POINTER(c_char)))
+	fields.append(('outfile', (c_char * FILENAME_MAX)))
+	if __libzint_ver < 21100:
+		fields.append(('scale', c_float))
+	if __libzint_ver >= 21100:
+		fields.append(('primary', (c_char * ZINT_PRIMARY_SIZE)))
+	fields.extend([
+		('option_1', c_int),
+		('option_2', c_int),
+		('option_3', c_int),
+		('show_hrt', c_int)
+	])
+	if __libzint_ver >= 20603:
+		fields.append(('fontsize', c_int))
+	fields.extend([
+		('input_mode', c_int),
+		('eci', c_int)
+	])
+	if __libzint_ver >= 21200:
+		fields.append(('dpmm', c_float))
+	if __libzint_ver >= 21100:
+		fields.extend([
+			('dot_size', c_float),
+			('guard_descent', c_float),
+			('structapp', zint_structapp),
+			('warn_level', c_int),
+			('debug', c_int)
+		])
+	fields.extend([
+		('text', (c_ubyte * ZINT_TEXT_SIZE)),
+		('rows', c_int),
+		('width', c_int)
+	])
+	if __libzint_ver < 21100:
+		fields.append(('primary', (c_char * ZINT_PRIMARY_SIZE)))
+	fields.append(('encoded_data', ((c_ubyte * ZINT_COLS_MAX) * ZINT_ROWS_MAX)))
+	if __libzint_ver >= 21000:
+		fields.append(('row_height', (c_float * ZINT_ROWS_MAX)))
+	else:
+		fields.append(('row_height', (c_int * ZINT_ROWS_MAX)))
+	fields.append(('errtxt', (c_char * ZINT_ERR_SIZE)))
+	if __libzint_ver >= 20800:
+		fields.append(('bitmap', POINTER(c_ubyte)))
+	else:
+		fields.append(('bitmap', POINTER(c_char)))
+	fields.extend([
+		('bitmap_width', c_int),
+		('bitmap_height', c_int)
+	])
+	if __libzint_ver >= 20901:
+		fields.append(('alphamap', POINTER(c_ubyte)))
+	fields.append(('bitmap_byte_length', c_uint))
+	if __libzint_ver < 21100:
+		fields.append(('dot_size', c_float))
+	if __libzint_ver >= 20604:
+		fields.append(('vector', POINTER(zint_vector)))
+	if __libzint_ver <= 20900:
+		fields.append(('rendered', POINTER(zint_render)))
+	if __libzint_ver < 21100:
+		fields.append(('debug', c_int))
+		if __libzint_ver >= 21000:
+			fields.append(('warn_level', c_int))
+	zint_symbol._fields_ = fields
 
-ZBarcode_Encode_File = _lib.ZBarcode_Encode_File
-ZBarcode_Encode_File.restype = c_int
-ZBarcode_Encode_File.argtypes = [POINTER(zint_symbol), c_char_p]
+	if __libzint_ver >= 21100:
+		class zint_seg(Structure):
+			_fields_ = [
+				('source', POINTER(c_ubyte)),
+				('length', c_int),
+				('eci', c_int)
+			]
 
-ZBarcode_Print = _lib.ZBarcode_Print
-ZBarcode_Print.restype = c_int
-ZBarcode_Print.argtypes = [POINTER(zint_symbol), c_int]
+# restype and argtypes of every binding but ZBarcode_ValidID() and
+# ZBarcode_Version(), and the first libzint version that has it.  'symbol'
+# and 'seg' stand for pointers to those layouts.  Each binding is set up by
+# _bind() on its first lookup.
+_prototypes = {
+	'ZBarcode_Create': (20600, 'symbol', ()),
+	'ZBarcode_Delete': (20600, None, ('symbol',)),
+	'ZBarcode_Clear': (20600, None, ('symbol',)),
+	'ZBarcode_Encode': (20600, c_int, ('symbol', _source, c_int)),
+	'ZBarcode_Encode_File': (20600, c_int, ('symbol', c_char_p)),
+	'ZBarcode_Print': (20600, c_int, ('symbol', c_int)),
+	'ZBarcode_Encode_and_Print': (20600, c_int, ('symbol', _source, c_int, c_int)),
+	'ZBarcode_Encode_File_and_Print': (20600, c_int, ('symbol', c_char_p, c_int)),
+	'ZBarcode_Buffer': (20600, c_int, ('symbol', c_int)),
+	'ZBarcode_Encode_and_Buffer': (20600, c_int, ('symbol', _source, c_int, c_int)),
+	'ZBarcode_Encode_File_and_Buffer': (20600, c_int, ('symbol', c_char_p, c_int)),
+	'ZBarcode_Buffer_Vector': (20604, c_int, ('symbol', c_int)),
+	'ZBarcode_Encode_and_Buffer_Vector': (20604, c_int, ('symbol', _source, c_int, c_int)),
+	'ZBarcode_Encode_File_and_Buffer_Vector': (20604, c_int, ('symbol', c_char_p, c_int)),
+	'ZBarcode_Cap': (21000, c_uint, (c_int, c_uint)),
+	'ZBarcode_Encode_Segs': (21100, c_int, ('symbol', 'seg', c_int)),
+	'ZBarcode_Encode_Segs_and_Print': (21100, c_int, ('symbol', 'seg', c_int, c_int)),
+	'ZBarcode_Encode_Segs_and_Buffer': (21100, c_int, ('symbol', 'seg', c_int, c_int)),
+	'ZBarcode_Encode_Segs_and_Buffer_Vector': (21100, c_int, ('symbol', 'seg', c_int, c_int)),
+	'ZBarcode_BarcodeName': (21100, c_int, (c_int, 'name')),
+	'ZBarcode_Default_Xdim': (21200, c_float, (c_int,)),
+	'ZBarcode_Scale_From_XdimDp': (21200, c_float, (c_int, c_float, c_float, 'chars')),
+	'ZBarcode_XdimDp_From_Scale': (21200, c_float, (c_int, c_float, c_float, 'chars')),
+	'ZBarcode_NoPng': (21200, c_int, ())
+}
 
-ZBarcode_Encode_and_Print = _lib.ZBarcode_Encode_and_Print
-ZBarcode_Encode_and_Print.restype = c_int
-ZBarcode_Encode_and_Print.argtypes = [POINTER(zint_symbol), POINTER(c_ubyte), c_int, c_int]
+def _ctype (kind):
+	if kind == 'symbol':
+		return POINTER(_get('zint_symbol'))
+	if kind == 'seg':
+		return POINTER(_get('zint_seg'))
+	if kind == 'name':
+		return c_char * 32
+	if kind == 'chars':
+		return POINTER(c_char)
+	return kind
 
-ZBarcode_Encode_File_and_Print = _lib.ZBarcode_Encode_File_and_Print
-ZBarcode_Encode_File_and_Print.restype = c_int
-ZBarcode_Encode_File_and_Print.argtypes = [POINTER(zint_symbol), c_char_p, c_int]
+def _bind (name):
+	version, restype, argtypes = _prototypes[name]
+	if __libzint_ver < version:
+		return
+	# Print and Vector calls can leave symbol->vector set
+	if ('Print' in name or 'Vector' in name) and 'zint_vector' not in globals():
+		_vector_layouts()
+	func = getattr(_lib, name)
+	func.restype = _ctype(restype)
+	func.argtypes = [_ctype(kind) for kind in argtypes]
+	globals()[name] = func
 
-ZBarcode_Buffer = _lib.ZBarcode_Buffer
-ZBarcode_Buffer.restype = c_int
-ZBarcode_Buffer.argtypes = [POINTER(zint_symbol), c_int]
+if __libzint_ver >= 21100:
+	# Builds the zint_seg array for ZBarcode_Encode_Segs*() straight over
+	# the callers' buffers (see _pin()) and keeps them alive.  Segments are
+	# data or (data, eci) and may come from any iterable, including a
+	# generator.
+	class Segments(object):
+		def __init__ (self, segments=()):
+			self._segs = []
+			self.length = 0
+			for segment in segments:
+				if isinstance(segment, tuple):
+					self.add(*segment)
+				else:
+					self.add(segment)
 
-ZBarcode_Encode_and_Buffer = _lib.ZBarcode_Encode_and_Buffer
-ZBarcode_Encode_and_Buffer.restype = c_int
-ZBarcode_Encode_and_Buffer.argtypes = [POINTER(zint_symbol), POINTER(c_ubyte), c_int, c_int]
+		def __len__ (self):
+			return len(self._segs)
 
-ZBarcode_Encode_File_and_Buffer = _lib.ZBarcode_Encode_File_and_Buffer
-ZBarcode_Encode_File_and_Buffer.restype = c_int
-ZBarcode_Encode_File_and_Buffer.argtypes = [POINTER(zint_symbol), c_char_p, c_int]
+		def add (self, data, eci=0):
+			if len(self._segs) >= ZINT_MAX_SEG_COUNT:
+				raise ValueError('more than %d segments' % ZINT_MAX_SEG_COUNT)
+			if not 0 <= eci <= 999999:
+				raise ValueError('invalid ECI %d' % eci)
+			source, length = _pin(data)
+			if not length:
+				raise ValueError('empty segment')
+			if self.length + length > ZINT_MAX_DATA_LEN:
+				raise ValueError('segments exceed %d bytes' % ZINT_MAX_DATA_LEN)
+			self._segs.append((source, length, eci))
+			self.length += length
 
-if __libzint_ver >= 20604:
-	ZBarcode_Buffer_Vector = _lib.ZBarcode_Buffer_Vector
-	ZBarcode_Buffer_Vector.restype = c_int
-	ZBarcode_Buffer_Vector.argtypes = [POINTER(zint_symbol), c_int]
-	
-	ZBarcode_Encode_and_Buffer_Vector = _lib.ZBarcode_Encode_and_Buffer_Vector
-	ZBarcode_Encode_and_Buffer_Vector.restype = c_int
-	ZBarcode_Encode_and_Buffer_Vector.argtypes = [POINTER(zint_symbol), POINTER(c_ubyte), c_int, c_int]
-
-	ZBarcode_Encode_File_and_Buffer_Vector = _lib.ZBarcode_Encode_File_and_Buffer_Vector
-	ZBarcode_Encode_File_and_Buffer_Vector.restype = c_int
-	ZBarcode_Encode_File_and_Buffer_Vector.argtypes = [POINTER(zint_symbol), c_char_p, c_int]
+		# (zint_seg array, count); the array refers to buffers owned by self
+		def array (self):
+			if not self._segs:
+				raise ValueError('no segments')
+			segs = (_get('zint_seg') * len(self._segs))()
+			for seg, (source, length, eci) in zip(segs, self._segs):
+				seg.source = source
+				seg.length = length
+				seg.eci = eci
+			return segs, len(self._segs)
 
-if __libzint_ver >= 21000:
-	ZBarcode_Cap = _lib.ZBarcode_Cap
-	ZBarcode_Cap.restype = c_uint
-	ZBarcode_Cap.argtypes = [c_int, c_uint]
+		def encode (self, symbol):
+			_check_symbol(symbol)
+			return _get('ZBarcode_Encode_Segs')(symbol, *self.array())
 
-if __libzint_ver >= 21100:
-	ZBarcode_Encode_Segs = _lib.ZBarcode_Encode_Segs
-	ZBarcode_Encode_Segs.restype = c_int
-	ZBarcode_Encode_Segs.argtypes = [POINTER(zint_symbol), POINTER(zint_seg), c_int]
+		def encode_and_print (self, symbol, rotate_angle=0):
+			_check_symbol(symbol)
+			return _get('ZBarcode_Encode_Segs_and_Print')(symbol, *(self.array() + (rotate_angle,)))
 
-	ZBarcode_Encode_Segs_and_Print = _lib.ZBarcode_Encode_Segs_and_Print
-	ZBarcode_Encode_Segs_and_Print.restype = c_int
-	ZBarcode_Encode_Segs_and_Print.argtypes = [POINTER(zint_symbol), POINTER(zint_seg), c_int, c_int]
+		def encode_and_buffer (self, symbol, rotate_angle=0):
+			_check_symbol(symbol)
+			return _get('ZBarcode_Encode_Segs_and_Buffer')(symbol, *(self.array() + (rotate_angle,)))
 
-	ZBarcode_Encode_Segs_and_Buffer = _lib.ZBarcode_Encode_Segs_and_Buffer
-	ZBarcode_Encode_Segs_and_Buffer.restype = c_int
-	ZBarcode_Encode_Segs_and_Buffer.argtypes = [POINTER(zint_symbol), POINTER(zint_seg), c_int, c_int]
+		def encode_and_buffer_vector (self, symbol, rotate_angle=0):
+			_check_symbol(symbol)
+			return _get('ZBarcode_Encode_Segs_and_Buffer_Vector')(symbol, *(self.array() + (rotate_angle,)))
 
-	ZBarcode_Encode_Segs_and_Buffer_Vector = _lib.ZBarcode_Encode_Segs_and_Buffer_Vector
-	ZBarcode_Encode_Segs_and_Buffer_Vector.restype = c_int
-	ZBarcode_Encode_Segs_and_Buffer_Vector.argtypes = [POINTER(zint_symbol), POINTER(zint_seg), c_int, c_int]
+# zint_symbol fields written by libzint rather than by the caller.  fgcolor
+# and bgcolor point back into the structure itself and must never be copied
+# between symbols.
+_symbol_output_fields = (
+	'text', 'rows', 'width', 'encoded_data', 'row_height', 'errtxt',
+	'bitmap', 'bitmap_width', 'bitmap_height', 'alphamap',
+	'bitmap_byte_length', 'vector', 'rendered', 'fgcolor', 'bgcolor'
+)
+def _input_layout ():
+	global _symbol_input_fields, _symbol_input_runs
+	symbol = _get('zint_symbol')
+	_symbol_input_fields = tuple(
+		f[0] for f in symbol._fields_ if f[0] not in _symbol_output_fields
+	)
+	# (start, end) byte ranges of zint_symbol covering its input fields.
+	# Ranges break at output fields, including fgcolor and bgcolor which
+	# point into the symbol itself and so must keep the target's values.
+	runs = []
+	run = None
+	for name, kind in symbol._fields_:
+		field = getattr(symbol, name)
+		if name in _symbol_output_fields:
+			run = None
+		elif run is None:
+			run = [field.offset, field.offset + field.size]
+			runs.append(run)
+		else:
+			run[1] = field.offset + field.size
+	_symbol_input_runs = tuple(tuple(r) for r in runs)
 
-	ZBarcode_BarcodeName = _lib.ZBarcode_BarcodeName
-	ZBarcode_BarcodeName.restype = c_int
-	ZBarcode_BarcodeName.argtypes = [c_int, c_char * 32]
+# Byte image of every input field of a symbol configured from options,
+# built once.  apply() stamps it onto a symbol with one copy per run of
+# input fields (two since 2.11: before and after fgcolor/bgcolor) instead
+# of a setattr per field.
+class SymbolTemplate(object):
+	def __init__ (self, options=None):
+		if options is None:
+			options = {}
+		for name in options:
+			if name not in _get('_symbol_input_fields'):
+				raise AttributeError('zint_symbol has no input field %r' % name)
+		symbol = _get('ZBarcode_Create')()
+		if not symbol:
+			raise MemoryError('ZBarcode_Create() failed')
+		try:
+			contents = symbol.contents
+			for name, value in options.items():
+				setattr(contents, name, value)
+			base = addressof(contents)
+			self._runs = [
+				(start, end, string_at(base + start, end - start))
+				for start, end in _get('_symbol_input_runs')
+			]
+		finally:
+			_get('ZBarcode_Delete')(symbol)
+		self.options = dict(options)
 
-if __libzint_ver >= 21200:
-	ZBarcode_Default_Xdim = _lib.ZBarcode_Default_Xdim
-	ZBarcode_Default_Xdim.restype = c_float
-	ZBarcode_Default_Xdim.argtypes = [c_int]
+	def stamp (self, symbol):
+		# Input fields only; anything from a previous encode stays.  Slice
+		# assignment on a byte view of the structure is a plain memcpy and
+		# cheaper than a foreign call to memmove() per run.
+		view = memoryview(symbol.contents).cast('B')
+		for start, end, image in self._runs:
+			view[start:end] = image
 
-	ZBarcode_Scale_From_XdimDp = _lib.ZBarcode_Scale_From_XdimDp
-	ZBarcode_Scale_From_XdimDp.restype = c_float
-	ZBarcode_Scale_From_XdimDp.argtypes = [c_int, c_float, c_float, POINTER(c_char)]
+	def apply (self, symbol):
+		_check_symbol(symbol)
+		_get('ZBarcode_Clear')(symbol)
+		self.stamp(symbol)
 
-	ZBarcode_XdimDp_From_Scale = _lib.ZBarcode_XdimDp_From_Scale
-	ZBarcode_XdimDp_From_Scale.restype = c_float
-	ZBarcode_XdimDp_From_Scale.argtypes = [c_int, c_float, c_float, POINTER(c_char)]
+	def create (self):
+		symbol = _get('ZBarcode_Create')()
+		if not symbol:
+			raise MemoryError('ZBarcode_Create() failed')
+		self.stamp(symbol)
+		return symbol
 
-	ZBarcode_NoPng = _lib.ZBarcode_NoPng
-	ZBarcode_NoPng.restype = c_int
-	ZBarcode_NoPng.argtypes = []
+# template as a SymbolTemplate: one is used as it is, anything else (a dict
+# of options or None) builds one
+def _as_template (template):
+	if isinstance(template, SymbolTemplate):
+		return template
+	return SymbolTemplate(template)
 
 __all__ = [
-	'__version__', 'instr', 'infile', 'bitmapbuf',
-	'ZBarcode_Version', 'ZBarcode_Create', 'ZBarcode_Delete',
+	'__version__', 'instr', 'infile', 'bitmapbuf', 'bitmapview',
+	'bitmaparray', 'SymbolTemplate',
+	'ZBarcode_Version', 'ZBarcode_Create', 'ZBarcode_Delete', 'ZBarcode_Clear',
 	'ZBarcode_Encode', 'ZBarcode_Encode_File', 'ZBarcode_Print',
 	'ZBarcode_Encode_and_Print', 'ZBarcode_Encode_File_and_Print',
 	'ZBarcode_Buffer', 'ZBarcode_Encode_and_Buffer',
@@ -658,7 +901,7 @@ if __libzint_ver >= 21100:
 		'BARCODE_NO_QUIET_ZONES', 'COMPLIANT_HEIGHT',
 		'HEIGHTPERROW_MODE', 'FAST_MODE', 'ZINT_CAP_QUIET_ZONES',
 		'ZINT_CAP_STRUCTAPP', 'ZINT_CAP_COMPLIANT_HEIGHT',
-		'ZINT_MAX_SEG_COUNT', 'BARCODE_LAST'
+		'ZINT_MAX_SEG_COUNT', 'BARCODE_LAST', 'Segments'
 	])
 if __libzint_ver >= 21000:
 	__all__.append('ZBarcode_Cap')
@@ -718,7 +961,7 @@ __all__.extend([
 	'BARCODE_GRIDMATRIX'
 ])
 if __libzint_ver >= 20901:
-	__all__.append('BARCODE_DPD')
+	__all__.extend(['BARCODE_DPD', 'alphamapview', 'alphamaparray'])
 if __libzint_ver >= 20601:
 	__all__.append('BARCODE_UPNQR')
 if __libzint_ver >= 20604:
@@ -785,3 +1028,35 @@ __all__.extend([
 	'OUT_PNG_FILE', 'OUT_BMP_FILE', 'OUT_GIF_FILE',
 	'OUT_PCX_FILE', 'OUT_JPG_FILE', 'OUT_TIF_FILE'
 ])
+
+_build_lock = RLock()
+
+def __getattr__ (name):
+	# Builds a layout or binding on its first lookup; one of a later
+	# libzint than the loaded one stays missing, so hasattr() tells
+	with _build_lock:
+		if name not in globals():
+			if name in _prototypes:
+				_bind(name)
+			elif name in _layout_names:
+				_layouts()
+			elif name in _vector_names:
+				_vector_layouts()
+			elif name in ('_symbol_input_fields', '_symbol_input_runs'):
+				_input_layout()
+			elif name == '__version__':
+				from ._version import __version__ as version
+				globals()[name] = version
+	try:
+		return globals()[name]
+	except KeyError:
+		raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def _get (name):
+	try:
+		return globals()[name]
+	except KeyError:
+		return __getattr__(name)
+
+def __dir__ ():
+	return sorted(set(globals()) | set(__all__))